@@ -0,0 +1,47 @@
+"""Restore stays table as place details cache
+
+Revision ID: 5c2e9a7d41f3
+Revises: ec1089897471
+Create Date: 2026-10-17 10:12:04.118532
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2e9a7d41f3'
+down_revision: Union[str, Sequence[str], None] = 'ec1089897471'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Same shape as the stays table from the initial migration, with the
+    # photo stored as a reference (so the API key never lands in the table),
+    # millisecond timestamps like destinations, and a per-entry expiry.
+    op.create_table('stays',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('place_id', sa.String(), nullable=False),
+    sa.Column('phone', sa.String(), nullable=True),
+    sa.Column('photo_reference', sa.String(), nullable=True),
+    sa.Column('lat', sa.Float(), nullable=False),
+    sa.Column('lng', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.BigInteger(), nullable=True),
+    sa.Column('expires_at', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('place_id')
+    )
+    op.create_index(op.f('ix_stays_id'), 'stays', ['id'], unique=False)
+    op.create_index(op.f('ix_stays_expires_at'), 'stays', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_stays_expires_at'), table_name='stays')
+    op.drop_index(op.f('ix_stays_id'), table_name='stays')
+    op.drop_table('stays')
@@ -0,0 +1,45 @@
+"""Restore itineraries table as itinerary cache
+
+Revision ID: 8d4b0f6e2a19
+Revises: 5c2e9a7d41f3
+Create Date: 2026-10-17 11:03:41.572210
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d4b0f6e2a19'
+down_revision: Union[str, Sequence[str], None] = '5c2e9a7d41f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Same shape as the itineraries table from the initial migration, plus the
+    # grid-snapped cache key, millisecond timestamps and a per-entry expiry.
+    op.create_table('itineraries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cache_key', sa.String(), nullable=False),
+    sa.Column('start_lat', sa.Float(), nullable=False),
+    sa.Column('start_lng', sa.Float(), nullable=False),
+    sa.Column('end_lat', sa.Float(), nullable=False),
+    sa.Column('end_lng', sa.Float(), nullable=False),
+    sa.Column('itinerary_data', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.BigInteger(), nullable=True),
+    sa.Column('expires_at', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_itineraries_id'), 'itineraries', ['id'], unique=False)
+    op.create_index('ix_itineraries_cache_key_created_at', 'itineraries', ['cache_key', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_itineraries_cache_key_created_at', table_name='itineraries')
+    op.drop_index(op.f('ix_itineraries_id'), table_name='itineraries')
+    op.drop_table('itineraries')
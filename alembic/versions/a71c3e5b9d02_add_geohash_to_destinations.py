@@ -0,0 +1,56 @@
+"""Add geohash to destinations
+
+Revision ID: a71c3e5b9d02
+Revises: 8d4b0f6e2a19
+Create Date: 2026-10-17 12:26:53.904117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from geo import encode_geohash
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a71c3e5b9d02'
+down_revision: Union[str, Sequence[str], None] = '8d4b0f6e2a19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('destinations', sa.Column('geohash', sa.String(length=12), nullable=True))
+
+    # Backfill existing rows in batches
+    connection = op.get_bind()
+    destinations = sa.table('destinations', sa.column('id'), sa.column('lat'), sa.column('long'), sa.column('geohash'))
+    while True:
+        rows = connection.execute(
+            sa.select(destinations.c.id, destinations.c.lat, destinations.c.long)
+            .where(destinations.c.geohash.is_(None))
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        connection.execute(
+            destinations.update()
+            .where(destinations.c.id == sa.bindparam('b_id'))
+            .values(geohash=sa.bindparam('b_geohash')),
+            [{'b_id': row.id, 'b_geohash': encode_geohash(row.lat, row.long)} for row in rows]
+        )
+
+    op.create_index(
+        'ix_destinations_geohash', 'destinations', ['geohash'], unique=False,
+        postgresql_ops={'geohash': 'varchar_pattern_ops'}
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_destinations_geohash', table_name='destinations')
+    op.drop_column('destinations', 'geohash')
@@ -0,0 +1,33 @@
+"""Add destinations keyset index
+
+Revision ID: c3f8e1d2b6a4
+Revises: a71c3e5b9d02
+Create Date: 2026-10-17 13:40:18.251936
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f8e1d2b6a4'
+down_revision: Union[str, Sequence[str], None] = 'a71c3e5b9d02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keyset pagination compares (created_at, id) row values, which needs a
+    # non-null created_at; rows that never got one sort first.
+    op.execute("UPDATE destinations SET created_at = 0 WHERE created_at IS NULL;")
+    op.alter_column('destinations', 'created_at', existing_type=sa.BigInteger(), nullable=False)
+    op.create_index('ix_destinations_created_at_id', 'destinations', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_destinations_created_at_id', table_name='destinations')
+    op.alter_column('destinations', 'created_at', existing_type=sa.BigInteger(), nullable=True)
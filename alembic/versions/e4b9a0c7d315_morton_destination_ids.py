@@ -0,0 +1,64 @@
+"""Rewrite destination ids as Morton keys
+
+Revision ID: e4b9a0c7d315
+Revises: c3f8e1d2b6a4
+Create Date: 2026-10-17 16:05:42.118304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from geo import encode_morton
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b9a0c7d315'
+down_revision: Union[str, Sequence[str], None] = 'c3f8e1d2b6a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+destinations = sa.table('destinations', sa.column('id'), sa.column('lat'), sa.column('long'))
+
+
+def morton_id(lat: float, long: float) -> str:
+    # Same as Destination.generate_id at this revision
+    return f"{encode_morton(round(lat, 6), round(long, 6)):016x}"
+
+
+def legacy_id(lat: float, long: float) -> str:
+    return f"{round(lat, 6)}_{round(long, 6)}"
+
+
+def rewrite_ids(legacy: bool, new_id) -> None:
+    # Legacy ids always contain "_" and Morton ids never do, so old and new
+    # ids can't collide while the table is half converted
+    connection = op.get_bind()
+    has_separator = destinations.c.id.contains('_', autoescape=True)
+    while True:
+        rows = connection.execute(
+            sa.select(destinations.c.id, destinations.c.lat, destinations.c.long)
+            .where(has_separator if legacy else ~has_separator)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        connection.execute(
+            destinations.update()
+            .where(destinations.c.id == sa.bindparam('b_id'))
+            .values(id=sa.bindparam('b_new_id')),
+            [{'b_id': row.id, 'b_new_id': new_id(row.lat, row.long)} for row in rows]
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    rewrite_ids(legacy=True, new_id=morton_id)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    rewrite_ids(legacy=False, new_id=legacy_id)
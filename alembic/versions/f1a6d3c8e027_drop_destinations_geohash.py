@@ -0,0 +1,59 @@
+"""Drop geohash from destinations
+
+Morton ids carry the same bits as the geohash, so radius queries scan
+primary key ranges instead and the column and its index are redundant.
+
+Revision ID: f1a6d3c8e027
+Revises: e4b9a0c7d315
+Create Date: 2026-10-17 19:42:10.536871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from geo import encode_geohash
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1a6d3c8e027'
+down_revision: Union[str, Sequence[str], None] = 'e4b9a0c7d315'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_index('ix_destinations_geohash', table_name='destinations')
+    op.drop_column('destinations', 'geohash')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('destinations', sa.Column('geohash', sa.String(length=12), nullable=True))
+
+    # Backfill existing rows in batches
+    connection = op.get_bind()
+    destinations = sa.table('destinations', sa.column('id'), sa.column('lat'), sa.column('long'), sa.column('geohash'))
+    while True:
+        rows = connection.execute(
+            sa.select(destinations.c.id, destinations.c.lat, destinations.c.long)
+            .where(destinations.c.geohash.is_(None))
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        connection.execute(
+            destinations.update()
+            .where(destinations.c.id == sa.bindparam('b_id'))
+            .values(geohash=sa.bindparam('b_geohash')),
+            [{'b_id': row.id, 'b_geohash': encode_geohash(row.lat, row.long)} for row in rows]
+        )
+
+    op.create_index(
+        'ix_destinations_geohash', 'destinations', ['geohash'], unique=False,
+        postgresql_ops={'geohash': 'varchar_pattern_ops'}
+    )
@@ -0,0 +1,66 @@
+"""Time a bulk destination import and export against a running server.
+
+Usage: python benchmarks/bulk_import.py --url http://127.0.0.1:8000 --rows 100000
+
+Streams synthetic NDJSON rows to POST /destinations/bulk, then reads the
+table back through GET /destinations/export.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+
+async def generate_body(rows: int, seed: int):
+    rng = random.Random(seed)
+    lines = []
+    for i in range(rows):
+        lines.append(json.dumps({
+            "name": f"Synthetic destination {i}",
+            "lat": round(rng.uniform(8, 37), 6),
+            "long": round(rng.uniform(68, 97), 6),
+            "image_urls": []
+        }) + "\n")
+        if len(lines) == 1000:
+            yield "".join(lines).encode()
+            lines = []
+    if lines:
+        yield "".join(lines).encode()
+
+
+async def run(args):
+    async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+        started = time.perf_counter()
+        response = await client.post(
+            "/destinations/bulk",
+            content=generate_body(args.rows, args.seed),
+            headers={"content-type": "application/x-ndjson"}
+        )
+        response.raise_for_status()
+        report = response.json()
+        elapsed = time.perf_counter() - started
+        print(f"import: {report['inserted']} inserted, {len(report['conflicts'])} conflicts, "
+              f"{len(report['errors'])} errors in {elapsed:.2f}s ({args.rows / elapsed:.0f} rows/s)")
+
+        started = time.perf_counter()
+        exported = 0
+        async with client.stream("GET", "/destinations/export") as response:
+            async for _ in response.aiter_lines():
+                exported += 1
+        elapsed = time.perf_counter() - started
+        print(f"export: {exported} rows in {elapsed:.2f}s ({exported / elapsed:.0f} rows/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
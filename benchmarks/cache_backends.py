@@ -0,0 +1,107 @@
+"""Compare the cache backends on place-details-sized entries.
+
+Usage: python benchmarks/cache_backends.py [--entries 2000] [--batch 20] [--redis-url redis://127.0.0.1:6379/0]
+
+For each backend, writes `entries` values in batches the size of a nearby
+page, reads them back the same way, and reports per-batch latency. Each
+shared backend is also checked from a second client, the way another worker
+would see it. Without --redis-url the Redis backend runs against
+benchmarks/fake_redis.py started in-process. Also prints the stored entry
+size and encode/decode cost.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import TTLCache
+from cache_backends import Cache, RedisBackend, SQLiteBackend, decode_value, encode_value
+import fake_redis
+
+
+def sample_entry(index: int) -> dict:
+    return {
+        "name": f"Hotel Himalayan View {index}",
+        "phone": "+91 98160 %05d" % index,
+        "photo_reference": "AUc7tXV" + "x" * 180 + str(index),
+        "lat": 32.2432 + index * 1e-4,
+        "lng": 77.1892 - index * 1e-4
+    }
+
+
+def codec_report(entries: list) -> None:
+    started = time.perf_counter()
+    encoded = [encode_value(entry) for entry in entries]
+    encode_us = (time.perf_counter() - started) / len(entries) * 1e6
+    started = time.perf_counter()
+    for data in encoded:
+        decode_value(data)
+    decode_us = (time.perf_counter() - started) / len(encoded) * 1e6
+    print(f"codec:   {statistics.mean(map(len, encoded)):6.0f} B/entry, {encode_us:5.2f} us encode, {decode_us:5.2f} us decode")
+
+
+async def run_backend(label: str, make_backend, entries: int, batch: int, shared: bool) -> None:
+    cache = Cache("bench", make_backend(), ttl=600)
+    keys = [f"place{index}" for index in range(entries)]
+    batches = [keys[start:start + batch] for start in range(0, entries, batch)]
+
+    writes = []
+    for chunk in batches:
+        started = time.perf_counter()
+        await cache.set_many({key: sample_entry(int(key[5:])) for key in chunk})
+        writes.append(time.perf_counter() - started)
+
+    reads = []
+    for chunk in batches:
+        started = time.perf_counter()
+        found = await cache.get_many(chunk)
+        reads.append(time.perf_counter() - started)
+        assert len(found) == len(chunk), f"{label}: {len(chunk) - len(found)} entries missing"
+
+    if shared:
+        # A second client on the same store, as another worker would have
+        other = Cache("bench", make_backend(), ttl=600)
+        assert await other.get(keys[0]) == sample_entry(0), f"{label}: entry not visible to another client"
+        await other.backend.close()
+        await cache.backend.close()
+
+    print(f"{label:<8} set_many p50 {statistics.median(writes) * 1000:7.3f} ms   "
+          f"get_many p50 {statistics.median(reads) * 1000:7.3f} ms   ({batch} entries/batch)")
+
+
+async def _main(args) -> None:
+    codec_report([sample_entry(index) for index in range(1000)])
+
+    await run_backend("memory", lambda: TTLCache(maxsize=args.entries, ttl=600), args.entries, args.batch, shared=False)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.sqlite3")
+        await run_backend("sqlite", lambda: SQLiteBackend(path), args.entries, args.batch, shared=True)
+
+    server = None
+    redis_url = args.redis_url
+    if redis_url is None:
+        server = await fake_redis.serve("127.0.0.1", 0)
+        redis_url = f"redis://127.0.0.1:{server.sockets[0].getsockname()[1]}/0"
+    try:
+        await run_backend("redis", lambda: RedisBackend(redis_url), args.entries, args.batch, shared=True)
+    finally:
+        if server is not None:
+            server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=20, help="Keys per get_many/set_many; a nearby page is up to 20")
+    parser.add_argument("--redis-url", help="Use a real server instead of the in-process stand-in")
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
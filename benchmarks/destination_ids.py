@@ -0,0 +1,103 @@
+"""Compare legacy "lat_long" destination ids with Morton-key ids.
+
+Usage: python benchmarks/destination_ids.py [--count 1000000] [--lookups 100000] [--cell-bits 20]
+
+Builds synthetic destinations in memory and keeps each id set sorted, as the
+primary key btree does in Postgres, then times:
+  generate   - building the id from coordinates
+  lookup     - point lookups by binary search on the sorted ids
+  scan       - finding every destination in the cell around a point. Morton
+               ids are a single range scan; legacy ids share no spatial
+               prefix, so the only option is a scan over every id
+"""
+import argparse
+import bisect
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import geo
+
+
+def legacy_id(lat: float, long: float) -> str:
+    return f"{round(lat, 6)}_{round(long, 6)}"
+
+
+def morton_id(lat: float, long: float) -> str:
+    return f"{geo.encode_morton(round(lat, 6), round(long, 6)):016x}"
+
+
+def timed(fn, items) -> float:
+    started = time.perf_counter()
+    for item in items:
+        fn(*item)
+    return (time.perf_counter() - started) / len(items)
+
+
+def lookup(keys, key) -> bool:
+    position = bisect.bisect_left(keys, key)
+    return position < len(keys) and keys[position] == key
+
+
+def cell_range(lat: float, lon: float, cell_bits: int) -> tuple:
+    """First and last Morton id of the cell given by the top `cell_bits` bits"""
+    mask = (1 << (64 - cell_bits)) - 1
+    key = geo.encode_morton(lat, lon)
+    return f"{key & ~mask:016x}", f"{key | mask:016x}"
+
+
+def range_scan(keys, low: str, high: str) -> list:
+    return keys[bisect.bisect_left(keys, low):bisect.bisect_right(keys, high)]
+
+
+def full_scan(rows, low: str, high: str) -> list:
+    # With legacy ids the cell has to be tested row by row
+    return [key for lat, lon in rows if low <= (key := morton_id(lat, lon)) <= high]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--scans", type=int, default=200)
+    parser.add_argument("--scan-queries", type=int, default=3, help="Full scans are slow; run only a few")
+    parser.add_argument("--cell-bits", type=int, default=20, help="Morton prefix length for the scan cell (20 bits is ~20 x 40 km)")
+    args = parser.parse_args()
+
+    random.seed(42)
+    # Roughly the bounding box of the Indian subcontinent
+    rows = [(random.uniform(8, 37), random.uniform(68, 97)) for _ in range(args.count)]
+
+    print(f"generate: legacy {timed(legacy_id, rows[:args.lookups]) * 1e6:6.2f} us/id   "
+          f"morton {timed(morton_id, rows[:args.lookups]) * 1e6:6.2f} us/id")
+
+    legacy_keys = sorted(legacy_id(lat, lon) for lat, lon in rows)
+    morton_keys = sorted(morton_id(lat, lon) for lat, lon in rows)
+    lengths = [len(key) for key in legacy_keys]
+    print(f"id length: legacy {min(lengths)}-{max(lengths)} (mean {statistics.mean(lengths):.1f})   morton 16")
+
+    probes = random.sample(rows, min(args.lookups, len(rows)))
+    legacy_probes = [(legacy_keys, legacy_id(lat, lon)) for lat, lon in probes]
+    morton_probes = [(morton_keys, morton_id(lat, lon)) for lat, lon in probes]
+    print(f"lookup:   legacy {timed(lookup, legacy_probes) * 1e6:6.2f} us      "
+          f"morton {timed(lookup, morton_probes) * 1e6:6.2f} us")
+
+    centres = [(random.uniform(8, 37), random.uniform(68, 97)) for _ in range(args.scans)]
+    ranges = [cell_range(lat, lon, args.cell_bits) for lat, lon in centres]
+    found = [len(range_scan(morton_keys, low, high)) for low, high in ranges]
+    ranged = timed(lambda low, high: range_scan(morton_keys, low, high), ranges)
+
+    scan_ranges = ranges[:args.scan_queries]
+    for low, high in scan_ranges:
+        assert sorted(full_scan(rows, low, high)) == range_scan(morton_keys, low, high)
+    scanned = timed(lambda low, high: full_scan(rows, low, high), scan_ranges)
+    print(f"scan:     full {scanned * 1000:8.2f} ms   morton range {ranged * 1000:8.3f} ms "
+          f"({statistics.mean(found):.0f} rows/cell, {scanned / ranged:.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Local stand-in for a Redis server, enough for cache_backends.RedisBackend.
+
+Usage: python benchmarks/fake_redis.py --port 6390
+
+Speaks RESP2 and supports PING, AUTH, SELECT, GET, MGET, SET (with PX/EX),
+DEL and FLUSHDB against an in-memory dict. Point the app at it with
+CACHE_BACKEND=redis CACHE_REDIS_URL=redis://127.0.0.1:6390/0.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache_backends import RedisError, read_reply
+
+
+def encode_reply(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, RedisError):
+        return b"-%s\r\n" % str(value).encode()
+    if isinstance(value, str):
+        return b"+%s\r\n" % value.encode()
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    return b"*%d\r\n" % len(value) + b"".join(encode_reply(item) for item in value)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def _live(self, key: bytes):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    def execute(self, command: list):
+        name = command[0].upper()
+        args = command[1:]
+        if name in (b"PING", b"AUTH", b"SELECT"):
+            return "PONG" if name == b"PING" else "OK"
+        if name == b"GET":
+            return self._live(args[0])
+        if name == b"MGET":
+            return [self._live(key) for key in args]
+        if name == b"SET":
+            expires = None
+            options = [option.upper() for option in args[2:]]
+            if b"PX" in options:
+                expires = time.monotonic() + int(args[2 + options.index(b"PX") + 1]) / 1000
+            elif b"EX" in options:
+                expires = time.monotonic() + int(args[2 + options.index(b"EX") + 1])
+            self.data[args[0]] = (args[1], expires)
+            return "OK"
+        if name == b"DEL":
+            return sum(self.data.pop(key, None) is not None for key in args)
+        if name == b"FLUSHDB":
+            self.data.clear()
+            return "OK"
+        return RedisError(f"ERR unknown command '{name.decode()}'")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                command = await read_reply(reader)
+                writer.write(encode_reply(self.execute(command)))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host: str, port: int) -> asyncio.AbstractServer:
+    return await asyncio.start_server(FakeRedis().handle, host, port)
+
+
+async def _main(args) -> None:
+    server = await serve(args.host, args.port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    asyncio.run(_main(parser.parse_args()))
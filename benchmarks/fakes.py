@@ -0,0 +1,161 @@
+"""Local stand-ins for the OpenAI and Google Maps APIs with configurable latency.
+
+Usage: python benchmarks/fakes.py --port 9100 --openai-latency 2 --places-latency 0.15
+
+Serves just enough of each API for the app: chat completions (plain and
+streamed tool calls) under /v1, and Places nearby search, place details,
+directions and photos under /maps/api. Point the app at it with
+OPENAI_BASE_URL=http://127.0.0.1:9100/v1 and
+GOOGLE_MAPS_BASE_URL=http://127.0.0.1:9100.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+from googlemaps.convert import encode_polyline
+
+# Smallest valid JPEG, enough for the photo proxy
+TINY_JPEG = bytes.fromhex(
+    "ffd8ffe000104a46494600010100000100010000ffdb004300080606070605080707070909080a0c140d0c0b0b0c1912130f"
+    "141d1a1f1e1d1a1c1c20242e2720222c231c1c2837292c30313434341f27393d38323c2e333432ffc0000b080001000101011100"
+    "ffc4001f0000010501010101010100000000000000000102030405060708090a0bffc400b5100002010303020403050504040000"
+    "017d01020300041105122131410613516107227114328191a1082342b1c11552d1f02433627282090a161718191a25262728292a"
+    "3435363738393a434445464748494a535455565758595a636465666768696a737475767778797a838485868788898a92939495"
+    "969798999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7b8b9bac2c3c4c5c6c7c8c9cad2d3d4d5d6d7d8d9dae1e2e3e4e5e6e7e8e9ea"
+    "f1f2f3f4f5f6f7f8f9faffda0008010100003f00fbd3ffd9"
+)
+
+
+def fake_itinerary(days: int = 4) -> dict:
+    return {
+        "itinerary": [
+            {
+                "day": day,
+                "start": {"lat": 28.6 + day, "long": 77.2 + day / 2},
+                "end": {"lat": 29.6 + day, "long": 77.7 + day / 2},
+                "distance_km": 200,
+                "places_to_see": ["Viewpoint", "Old fort"],
+                "stay": f"Town {day}"
+            }
+            for day in range(1, days + 1)
+        ]
+    }
+
+
+def create_app(openai_latency: float, places_latency: float, details_latency: float, results_per_page: int) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        arguments = json.dumps(fake_itinerary())
+        usage = {"prompt_tokens": 400, "completion_tokens": len(arguments) // 4, "total_tokens": 400 + len(arguments) // 4}
+        base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": body.get("model", "gpt-4o")}
+
+        if not body.get("stream"):
+            await asyncio.sleep(openai_latency)
+            return {
+                **base,
+                "object": "chat.completion",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": arguments},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            }
+
+        async def events():
+            pieces = [arguments[i:i + 40] for i in range(0, len(arguments), 40)]
+            for piece in pieces:
+                await asyncio.sleep(openai_latency / len(pieces))
+                delta = {"tool_calls": [{"index": 0, "id": "call_fake", "type": "function",
+                                         "function": {"name": "generate_itinerary", "arguments": piece}}]}
+                chunk = {**base, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/maps/api/place/nearbysearch/json")
+    async def nearby_search(location: str = "0,0", pagetoken: str = None):
+        await asyncio.sleep(places_latency)
+        lat, lng = (float(value) for value in location.split(","))
+        page = int(pagetoken) if pagetoken else 0
+        results = [
+            {
+                "name": f"Fake stay {page}-{i}",
+                "place_id": hashlib.md5(f"{location}:{page}:{i}".encode()).hexdigest(),
+                "geometry": {"location": {"lat": lat + random.uniform(-0.02, 0.02), "lng": lng + random.uniform(-0.02, 0.02)}}
+            }
+            for i in range(results_per_page)
+        ]
+        response = {"status": "OK", "results": results}
+        if page < 2:
+            response["next_page_token"] = str(page + 1)
+        return response
+
+    @app.get("/maps/api/place/details/json")
+    async def place_details(request: Request):
+        await asyncio.sleep(details_latency)
+        place_id = request.query_params.get("placeid") or request.query_params.get("place_id")
+        return {
+            "status": "OK",
+            "result": {
+                "formatted_phone_number": "+91 98765 43210",
+                "photos": [{"photo_reference": f"photo-{place_id}"}]
+            }
+        }
+
+    @app.get("/maps/api/directions/json")
+    async def directions(origin: str, destination: str):
+        await asyncio.sleep(places_latency)
+        start = [float(value) for value in origin.split(",")]
+        end = [float(value) for value in destination.split(",")]
+        points = [(start[0] + (end[0] - start[0]) * i / 50, start[1] + (end[1] - start[1]) * i / 50) for i in range(51)]
+        step = {
+            "start_location": {"lat": start[0], "lng": start[1]},
+            "end_location": {"lat": end[0], "lng": end[1]},
+            "distance": {"value": 400000},
+            "duration": {"value": 8 * 3600}
+        }
+        return {
+            "status": "OK",
+            "routes": [{
+                "summary": "Fake highway",
+                "overview_polyline": {"points": encode_polyline(points)},
+                "legs": [{**step, "steps": [step]}]
+            }]
+        }
+
+    @app.get("/maps/api/place/photo")
+    async def photo():
+        await asyncio.sleep(details_latency)
+        return Response(TINY_JPEG, media_type="image/jpeg")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--openai-latency", type=float, default=2.0, help="Seconds per chat completion")
+    parser.add_argument("--places-latency", type=float, default=0.15, help="Seconds per nearby search / directions call")
+    parser.add_argument("--details-latency", type=float, default=0.1, help="Seconds per place details / photo call")
+    parser.add_argument("--results-per-page", type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app(args.openai_latency, args.places_latency, args.details_latency, args.results_per_page)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Offline benchmark suite: runs the app against local stand-ins and a local database.
+
+Usage:
+    createdb trip_planner_bench
+    python benchmarks/harness.py --database-url postgresql://localhost/trip_planner_bench \
+        --concurrency 20 --requests 200 --output bench-results.json
+
+Starts benchmarks/fakes.py (OpenAI and Google Maps with configurable
+latency) and the app under uvicorn with one worker, applies the Alembic
+migrations, then drives /stays, /generate-itinerary and the /destinations
+CRUD endpoints at a fixed concurrency. Each scenario reports throughput and
+p50/p95/p99 latency; the whole run is written as JSON so runs can be diffed.
+The database must be Postgres (the schema uses ARRAY and ON CONFLICT) and
+should be a throwaway one.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from load_test import run_load
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ["stays", "itinerary", "destinations_create", "destinations_list", "destinations_get", "destinations_update", "destinations_delete"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def random_point(rng: random.Random) -> tuple:
+    return round(rng.uniform(8, 37), 6), round(rng.uniform(68, 97), 6)
+
+
+async def run_scenarios(args, app_url: str) -> dict:
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    results = {}
+    created_ids = []
+
+    async with httpx.AsyncClient(base_url=app_url, limits=limits, timeout=args.timeout) as client:
+        # Distinct coordinates per request, so caches and coalescing don't
+        # hide the upstream cost unless --repeat-keys is given
+        def point(index: int) -> tuple:
+            return random_point(random.Random(index if args.repeat_keys else rng.random()))
+
+        async def stays(index):
+            lat, lon = point(index % 10 if args.repeat_keys else index)
+            return await client.get("/stays", params={"lat": lat, "lon": lon})
+
+        async def itinerary(index):
+            start, end = point(index), point(index + 1)
+            params = {} if args.repeat_keys else {"refresh": "true"}
+            return await client.post("/generate-itinerary", params=params, json={
+                "start_lat": start[0], "start_lng": start[1], "end_lat": end[0], "end_lng": end[1]
+            })
+
+        async def destinations_create(index):
+            lat, lon = random_point(rng)
+            response = await client.post("/destinations", json={"name": f"Bench {index}", "lat": lat, "long": lon, "image_urls": []})
+            if response.status_code == 200:
+                created_ids.append(response.json()["id"])
+            return response
+
+        async def destinations_list(index):
+            return await client.get("/destinations", params={"limit": 50})
+
+        async def destinations_get(index):
+            return await client.get(f"/destinations/{created_ids[index % len(created_ids)]}")
+
+        async def destinations_update(index):
+            return await client.put(f"/destinations/{created_ids[index % len(created_ids)]}", json={"name": f"Bench {index} updated"})
+
+        async def destinations_delete(index):
+            return await client.delete(f"/destinations/{created_ids.pop()}")
+
+        scenarios = {
+            "stays": stays,
+            "itinerary": itinerary,
+            "destinations_create": destinations_create,
+            "destinations_list": destinations_list,
+            "destinations_get": destinations_get,
+            "destinations_update": destinations_update,
+            "destinations_delete": destinations_delete
+        }
+        for name in args.scenarios:
+            requests = args.requests
+            if name in ("destinations_get", "destinations_update", "destinations_delete"):
+                if not created_ids:
+                    print(f"{name}: skipped, run destinations_create first")
+                    continue
+                if name == "destinations_delete":
+                    requests = min(requests, len(created_ids))
+            result = await run_load(scenarios[name], args.concurrency, requests)
+            results[name] = result
+            print(f"{name:22} {result['throughput_rps']:8.1f} req/s  p50={result['p50_ms']:8.1f}ms  "
+                  f"p95={result['p95_ms']:8.1f}ms  p99={result['p99_ms']:8.1f}ms  errors={result['errors']}")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL", "postgresql://localhost/trip_planner_bench"))
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--openai-latency", type=float, default=2.0)
+    parser.add_argument("--places-latency", type=float, default=0.15)
+    parser.add_argument("--details-latency", type=float, default=0.1)
+    parser.add_argument("--repeat-keys", action="store_true", help="Reuse coordinates so caches and coalescing kick in")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="bench-results.json")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+
+    fake_port, app_port = free_port(), free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": args.database_url,
+        "OPENAI_API_KEY": "fake",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{fake_port}/v1",
+        "GOOGLE_MAPS_API_KEY": "AIzaFakeKeyForLocalBenchmarks",
+        "GOOGLE_MAPS_BASE_URL": f"http://127.0.0.1:{fake_port}",
+        "PHOTO_CACHE_DIR": tempfile.mkdtemp(prefix="trip-planner-bench-photos-")
+    }
+
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=REPO_ROOT, env=env, check=True)
+
+    processes = []
+    try:
+        processes.append(subprocess.Popen([
+            sys.executable, os.path.join(REPO_ROOT, "benchmarks", "fakes.py"),
+            "--port", str(fake_port),
+            "--openai-latency", str(args.openai_latency),
+            "--places-latency", str(args.places_latency),
+            "--details-latency", str(args.details_latency)
+        ], env=env))
+        processes.append(subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(app_port), "--workers", "1", "--log-level", "warning"
+        ], cwd=REPO_ROOT, env=env))
+        wait_for(f"http://127.0.0.1:{fake_port}/docs")
+        wait_for(f"http://127.0.0.1:{app_port}/metrics")
+
+        results = asyncio.run(run_scenarios(args, f"http://127.0.0.1:{app_port}"))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    report = {
+        "timestamp": int(time.time()),
+        "git_commit": git_commit(),
+        "config": {
+            key: getattr(args, key)
+            for key in ("concurrency", "requests", "openai_latency", "places_latency", "details_latency", "repeat_keys", "seed")
+        },
+        "results": results
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
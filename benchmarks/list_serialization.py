@@ -0,0 +1,92 @@
+"""Per-row CPU cost of building a GET /destinations page.
+
+Usage: python benchmarks/list_serialization.py [--rows 1000] [--images 8] [--repeat 20]
+
+Compares the previous path (ORM entities validated through
+DestinationResponse, one model_dump_json per row) with the column-tuple
+orjson path: all fields, a ?fields=id,name,lat,long projection, and the
+gzip-compressed NDJSON mode. Rows are synthetic and no database is needed;
+ORM entities are constructed the way a query result would hydrate them.
+"""
+import argparse
+import gzip
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson
+
+from database import Destination
+from main import DESTINATION_FIELDS, DestinationResponse, parse_fields
+
+PROJECTED = parse_fields("id,name,lat,long")
+
+
+def make_rows(count: int, images: int) -> list:
+    random.seed(42)
+    rows = []
+    for index in range(count):
+        lat, lng = random.uniform(8, 37), random.uniform(68, 97)
+        rows.append((
+            Destination.generate_id(lat, lng),
+            f"Destination {index}",
+            lat,
+            lng,
+            [f"https://images.example.com/destinations/{index}/{image}.jpg" for image in range(images)],
+            1_760_000_000_000 + index
+        ))
+    return rows
+
+
+def orm_pydantic(rows: list) -> bytes:
+    entities = [Destination(**dict(zip(DESTINATION_FIELDS, row))) for row in rows]
+    return ("[" + ",".join(DestinationResponse.model_validate(d).model_dump_json() for d in entities) + "]").encode()
+
+
+def tuples_orjson(rows: list, names=DESTINATION_FIELDS) -> bytes:
+    return orjson.dumps([dict(zip(names, row)) for row in rows])
+
+
+def projected_orjson(rows: list) -> bytes:
+    return tuples_orjson(rows, PROJECTED)
+
+
+def ndjson_gzip(rows: list) -> bytes:
+    body = b"".join(orjson.dumps(dict(zip(DESTINATION_FIELDS, row)), option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+    return gzip.compress(body, compresslevel=5, mtime=0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--images", type=int, default=8, help="image_urls per destination")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows, args.images)
+    # The projection happens in SQL, so projected rows only carry those columns
+    projected_rows = [row[:len(PROJECTED)] for row in rows]
+    cases = [
+        ("orm + pydantic", orm_pydantic, rows),
+        ("tuples + orjson", tuples_orjson, rows),
+        ("fields=id,name,lat,long", projected_orjson, projected_rows),
+        ("ndjson + gzip", ndjson_gzip, rows),
+    ]
+
+    baseline = None
+    for label, build, data in cases:
+        body = build(data)
+        started = time.process_time()
+        for _ in range(args.repeat):
+            build(data)
+        per_row = (time.process_time() - started) / (args.repeat * len(data))
+        baseline = baseline or per_row
+        print(f"{label:<24} {per_row * 1e6:7.2f} us/row CPU   {len(body) / len(data):7.1f} B/row   "
+              f"{baseline / per_row:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Concurrent load test against a running instance of the API.
+
+Usage:
+    uvicorn main:app --workers 1 --port 8000
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --path /destinations \
+        --concurrency 50 --requests 1000
+
+Run it once against a checkout from before the async I/O change and once
+after, with the same single worker, to compare throughput. Passing --body
+sends a POST with that JSON payload instead of a GET.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+
+async def run_load(make_request, concurrency: int, requests: int) -> dict:
+    """Issue `requests` calls of `make_request(i)` with `concurrency` in flight.
+
+    A response with a 5xx status or a transport error counts as an error.
+    Returns throughput and latency percentiles in a JSON-friendly dict.
+    """
+    remaining = list(range(requests))
+    latencies, errors = [], []
+
+    async def worker():
+        while remaining:
+            index = remaining.pop()
+            started = time.perf_counter()
+            try:
+                response = await make_request(index)
+                if response.status_code >= 500:
+                    errors.append(response.status_code)
+            except httpx.HTTPError as e:
+                errors.append(repr(e))
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(quantiles[49] * 1000, 2),
+        "p95_ms": round(quantiles[94] * 1000, 2),
+        "p99_ms": round(quantiles[98] * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2)
+    }
+
+
+async def run(args):
+    body = json.loads(args.body) if args.body else None
+    method = "POST" if body is not None else "GET"
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        result = await run_load(
+            lambda _: client.request(method, args.path, json=body),
+            args.concurrency,
+            args.requests
+        )
+
+    print(f"{method} {args.path} concurrency={args.concurrency} requests={result['requests']}")
+    print(f"throughput: {result['throughput_rps']:.1f} req/s over {result['elapsed_s']:.2f}s")
+    print(f"latency p50={result['p50_ms']:.1f}ms p95={result['p95_ms']:.1f}ms "
+          f"p99={result['p99_ms']:.1f}ms max={result['max_ms']:.1f}ms")
+    print(f"errors: {result['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", default="/destinations")
+    parser.add_argument("--body", help="JSON body; switches the request to POST")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=120)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Benchmark the id-range radius search used by GET /destinations/near.
+
+Usage: python benchmarks/near_query.py [--count 1000000] [--queries 200] [--radius-km 50]
+
+Builds synthetic destinations in memory, keeps them sorted by their Morton
+id (what the primary key btree gives Postgres) and compares id range scans
+plus the exact haversine check against a full-table haversine scan.
+This is a quick in-memory model of the index; near_query_postgres.py times
+the endpoint's actual query against Postgres.
+"""
+import argparse
+import bisect
+import heapq
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import geo
+
+
+def indexed_search(index, keys, lat, lon, radius_km, limit):
+    min_lat, max_lat, _, _ = geo.bounding_box(lat, lon, radius_km)
+    candidates = 0
+    nearby = []
+    for range_start, range_end in geo.covering_ranges(lat, lon, radius_km):
+        start = bisect.bisect_left(keys, f"{range_start:016x}")
+        end = bisect.bisect_left(keys, f"{range_end:016x}") if range_end < 1 << 64 else len(keys)
+        for _, point_lat, point_lon in index[start:end]:
+            candidates += 1
+            if not min_lat <= point_lat <= max_lat:
+                continue
+            distance_km = geo.haversine_km(lat, lon, point_lat, point_lon)
+            if distance_km <= radius_km:
+                nearby.append((distance_km, point_lat, point_lon))
+    return heapq.nsmallest(limit, nearby), candidates
+
+
+def full_scan(points, lat, lon, radius_km, limit):
+    nearby = []
+    for point_lat, point_lon in points:
+        distance_km = geo.haversine_km(lat, lon, point_lat, point_lon)
+        if distance_km <= radius_km:
+            nearby.append((distance_km, point_lat, point_lon))
+    return heapq.nsmallest(limit, nearby)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--scan-queries", type=int, default=3, help="Full scans are slow; run only a few")
+    parser.add_argument("--radius-km", type=float, default=50)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(42)
+    # Roughly the bounding box of the Indian subcontinent
+    points = [(random.uniform(8, 37), random.uniform(68, 97)) for _ in range(args.count)]
+
+    started = time.perf_counter()
+    index = sorted((f"{geo.encode_morton(round(lat, 6), round(lon, 6)):016x}", lat, lon) for lat, lon in points)
+    keys = [entry[0] for entry in index]
+    print(f"built id index for {args.count} points in {time.perf_counter() - started:.1f}s")
+
+    queries = [(random.uniform(8, 37), random.uniform(68, 97)) for _ in range(args.queries)]
+
+    started = time.perf_counter()
+    total_candidates = 0
+    for lat, lon in queries:
+        _, candidates = indexed_search(index, keys, lat, lon, args.radius_km, args.limit)
+        total_candidates += candidates
+    indexed = (time.perf_counter() - started) / len(queries)
+    print(f"indexed:   {indexed * 1000:8.2f} ms/query, {total_candidates / len(queries):.0f} candidates/query")
+
+    started = time.perf_counter()
+    for lat, lon in queries[:args.scan_queries]:
+        expected = full_scan(points, lat, lon, args.radius_km, args.limit)
+        assert indexed_search(index, keys, lat, lon, args.radius_km, args.limit)[0] == expected
+    scan = (time.perf_counter() - started) / min(args.scan_queries, len(queries))
+    print(f"full scan: {scan * 1000:8.2f} ms/query ({scan / indexed:.0f}x slower)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Benchmark GET /destinations/near's query against Postgres.
+
+Usage:
+    createdb trip_planner_bench
+    python benchmarks/near_query_postgres.py --database-url postgresql://localhost/trip_planner_bench \
+        [--count 1000000] [--queries 200] [--radius-km 50]
+
+Applies the Alembic migrations, loads `count` synthetic destinations (once;
+later runs reuse them), then times the endpoint's own query,
+Destination.candidates_near plus the haversine filter, through the app's
+async engine. Prints EXPLAIN ANALYZE for one query, which should show
+range scans on destinations_pkey, and compares a few queries with index
+scans disabled. Use the same throwaway database as benchmarks/harness.py;
+--cleanup deletes the loaded rows.
+"""
+import argparse
+import asyncio
+import importlib
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import insert
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import geo
+
+# Imported in main() once DATABASE_URL is set, since it is read at import time
+database = None
+
+BENCH_NAME = "near-bench"
+# Six columns per row; asyncpg allows at most 32767 bind parameters
+LOAD_BATCH_SIZE = 5000
+
+
+def random_point(rng: random.Random) -> tuple:
+    # Roughly the bounding box of the Indian subcontinent
+    return round(rng.uniform(8, 37), 6), round(rng.uniform(68, 97), 6)
+
+
+async def load(engine, count: int) -> None:
+    Destination = database.Destination
+    async with engine.connect() as conn:
+        loaded = await conn.scalar(select(func.count()).select_from(Destination).where(Destination.name == BENCH_NAME))
+    if loaded >= count:
+        print(f"reusing {loaded} loaded destinations")
+        return
+
+    rng = random.Random(42)
+    started = time.perf_counter()
+    remaining = count - loaded
+    while remaining > 0:
+        rows = []
+        for _ in range(min(LOAD_BATCH_SIZE, remaining)):
+            lat, lng = random_point(rng)
+            rows.append({
+                "id": Destination.generate_id(lat, lng), "name": BENCH_NAME, "lat": lat, "long": lng,
+                "image_urls": [], "created_at": int(time.time() * 1000)
+            })
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                insert(Destination).values(rows).on_conflict_do_nothing(index_elements=[Destination.id]).returning(Destination.id)
+            )
+            remaining -= len(result.all())
+    async with engine.connect() as conn:
+        await conn.execute(text("ANALYZE destinations"))
+        await conn.commit()
+    print(f"loaded {count - loaded} destinations in {time.perf_counter() - started:.1f}s")
+
+
+async def near(session, lat: float, lon: float, radius_km: float, limit: int) -> tuple:
+    """The endpoint's query and filter; returns (nearest ids, candidate count)"""
+    result = await session.execute(database.Destination.candidates_near(lat, lon, radius_km))
+    candidates = 0
+    nearby = []
+    for destination in result.scalars():
+        candidates += 1
+        distance_km = geo.haversine_km(lat, lon, destination.lat, destination.long)
+        if distance_km <= radius_km:
+            nearby.append((distance_km, destination.id))
+    nearby.sort()
+    return [destination_id for _, destination_id in nearby[:limit]], candidates
+
+
+async def timed_queries(queries: list, args, index_scans: bool = True) -> tuple:
+    latencies = []
+    candidates = []
+    results = []
+    async with database.AsyncSessionLocal() as session:
+        if not index_scans:
+            await session.execute(text("SET enable_indexscan = off"))
+            await session.execute(text("SET enable_bitmapscan = off"))
+        for lat, lon in queries:
+            started = time.perf_counter()
+            ids, count = await near(session, lat, lon, args.radius_km, args.limit)
+            latencies.append(time.perf_counter() - started)
+            candidates.append(count)
+            results.append(ids)
+        await session.rollback()
+    return latencies, candidates, results
+
+
+async def explain(engine, lat: float, lon: float, radius_km: float) -> None:
+    sql = database.Destination.candidates_near(lat, lon, radius_km).compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    )
+    async with engine.connect() as conn:
+        plan = await conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"))
+        print("\n".join(row[0] for row in plan))
+
+
+async def cleanup(engine) -> None:
+    async with engine.begin() as conn:
+        result = await conn.execute(delete(database.Destination).where(database.Destination.name == BENCH_NAME))
+    print(f"deleted {result.rowcount} destinations")
+
+
+async def run(args) -> None:
+    engine = database.get_async_engine()
+    try:
+        if args.cleanup:
+            await cleanup(engine)
+            return
+        await load(engine, args.count)
+
+        rng = random.Random(7)
+        queries = [random_point(rng) for _ in range(args.queries)]
+        await explain(engine, *queries[0], args.radius_km)
+
+        latencies, candidates, results = await timed_queries(queries, args)
+        print(f"indexed:   p50 {statistics.median(latencies) * 1000:8.2f} ms  "
+              f"p95 {statistics.quantiles(latencies, n=20)[-1] * 1000:8.2f} ms  "
+              f"{statistics.mean(candidates):.0f} candidates/query")
+
+        scan_queries = queries[:args.scan_queries]
+        scan_latencies, _, scan_results = await timed_queries(scan_queries, args, index_scans=False)
+        assert scan_results == results[:len(scan_queries)], "index and sequential scans disagree"
+        scan = statistics.median(scan_latencies)
+        print(f"seq scan:  p50 {scan * 1000:8.2f} ms  ({scan / statistics.median(latencies):.0f}x slower)")
+    finally:
+        await database.dispose_async_engine()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL", "postgresql://localhost/trip_planner_bench"))
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--scan-queries", type=int, default=3, help="Sequential scans are slow; run only a few")
+    parser.add_argument("--radius-km", type=float, default=50)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--cleanup", action="store_true", help="Delete the loaded destinations and exit")
+    args = parser.parse_args()
+
+    global database
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    database = importlib.import_module("database")
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=REPO_ROOT, env=os.environ, check=True)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Measure how long the app takes to import and to answer its first request.
+
+Usage: python benchmarks/startup.py [--runs 10] [--database-url postgresql://localhost/trip_planner_bench]
+
+Each run spawns a fresh interpreter, so nothing is shared between runs:
+  import     - `import main` alone, timed inside the child process
+  first      - uvicorn spawn until GET /metrics first answers
+The medians are printed along with every sample. No API keys are set, so the
+numbers also show the app starts without them. Without a reachable database
+the pool warm-up fails quickly and is logged, which still exercises startup.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from harness import free_port
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import main; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def child_env(database_url: str) -> dict:
+    env = {key: value for key, value in os.environ.items()
+           if key not in ("OPENAI_API_KEY", "GOOGLE_MAPS_API_KEY")}
+    env["DATABASE_URL"] = database_url
+    # Keep a local .env from supplying the keys again
+    env["RENDER"] = "true"
+    return env
+
+
+def time_import(env: dict) -> float:
+    output = subprocess.check_output([sys.executable, "-c", IMPORT_SNIPPET], cwd=REPO_ROOT, env=env, text=True)
+    return float(output.strip().splitlines()[-1])
+
+
+def time_first_response(env: dict, timeout: float) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env
+    )
+    try:
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            try:
+                httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=1).raise_for_status()
+                return time.perf_counter() - started
+            except httpx.HTTPError:
+                time.sleep(0.01)
+        raise RuntimeError(f"App did not answer within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL", "postgresql://localhost/trip_planner_bench"))
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    env = child_env(args.database_url)
+    imports = [time_import(env) for _ in range(args.runs)]
+    firsts = [time_first_response(env, args.timeout) for _ in range(args.runs)]
+
+    for label, samples in (("import", imports), ("first", firsts)):
+        print(f"{label:<8} median {statistics.median(samples) * 1000:8.1f} ms   "
+              f"samples {' '.join(f'{s * 1000:.0f}' for s in samples)}")
+
+
+if __name__ == "__main__":
+    main()
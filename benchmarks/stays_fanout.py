@@ -0,0 +1,62 @@
+"""Benchmark the /stays place details fan-out against a stubbed Google client.
+
+Usage: python benchmarks/stays_fanout.py [--latency 0.2] [--sizes 1,5,10,20]
+
+Compares a sequential loop over `gmaps.place` (the old behaviour) with
+`places.fetch_place_details`. The concurrent column should stay roughly flat
+as the number of results grows, as long as it stays under the concurrency cap.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from places import PLACE_DETAILS_CONCURRENCY, fetch_place_details
+
+
+class StubGoogleClient:
+    """Stands in for googlemaps.Client with a fixed per-call latency"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def place(self, place_id, fields=None):
+        time.sleep(self.latency)
+        return {"result": {"formatted_phone_number": "+91 00000 00000", "photos": []}}
+
+
+def run_sequential(gmaps, place_ids):
+    return [gmaps.place(place_id=place_id, fields=["formatted_phone_number", "photo"]) for place_id in place_ids]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.2, help="Stubbed seconds per details call")
+    parser.add_argument("--sizes", default="1,5,10,20", help="Comma separated result counts")
+    parser.add_argument("--skip-sequential", action="store_true")
+    args = parser.parse_args()
+
+    gmaps = StubGoogleClient(args.latency)
+    print(f"latency={args.latency}s concurrency={PLACE_DETAILS_CONCURRENCY}")
+    print(f"{'results':>8} {'sequential':>12} {'concurrent':>12}")
+    for size in [int(n) for n in args.sizes.split(",")]:
+        place_ids = [f"place-{i}" for i in range(size)]
+
+        sequential = float("nan")
+        if not args.skip_sequential:
+            started = time.perf_counter()
+            run_sequential(gmaps, place_ids)
+            sequential = time.perf_counter() - started
+
+        started = time.perf_counter()
+        asyncio.run(fetch_place_details(gmaps, place_ids))
+        concurrent = time.perf_counter() - started
+
+        print(f"{size:>8} {sequential:>11.2f}s {concurrent:>11.2f}s")
+
+
+if __name__ == "__main__":
+    main()
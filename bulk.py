@@ -0,0 +1,133 @@
+"""Streaming parsers for bulk destination imports."""
+import csv
+import json
+from collections import deque
+from typing import AsyncIterator, List, Tuple, Union
+
+# Column order for CSV imports; image_urls are separated by "|"
+CSV_FIELDS = ["name", "lat", "long", "image_urls"]
+
+
+async def _split_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Union[str, ValueError]]]:
+    """Split a streamed UTF-8 body into (line number, line) pairs, blank lines included.
+
+    Lines keep no terminator and a leading byte order mark is dropped. Lines
+    are split before decoding, so a line that is not valid UTF-8 comes back
+    as a ValueError for the caller to report instead of ending the import.
+    """
+    pending = b""
+    line_number = 0
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            line_number += 1
+            yield line_number, _decode_line(line, line_number)
+    if pending:
+        yield line_number + 1, _decode_line(pending, line_number + 1)
+
+
+def _decode_line(line: bytes, line_number: int) -> Union[str, ValueError]:
+    try:
+        # utf-8-sig drops the BOM that spreadsheet CSV exports start with
+        return line.decode("utf-8-sig" if line_number == 1 else "utf-8").rstrip("\r")
+    except UnicodeDecodeError as e:
+        return ValueError(f"Line is not valid UTF-8 (byte {e.start})")
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Union[str, ValueError]]]:
+    """(line number, line) pairs of a streamed body, skipping blank lines"""
+    async for line_number, line in _split_lines(chunks):
+        if isinstance(line, ValueError) or line.strip():
+            yield line_number, line
+
+
+class _LineFeed:
+    """Lines queued for a csv.reader, which pulls them as it needs them"""
+
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def iter_csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Union[List[str], ValueError]]]:
+    """(first line number, values) for each CSV row of a streamed body.
+
+    One csv.reader reads every line, so quoted fields may span lines. Lines
+    are handed over once the quotes seen so far balance, so the reader never
+    runs out mid-row except at the end of the body.
+    """
+    feed = _LineFeed()
+    reader = csv.reader(feed, strict=True)
+    quotes = 0
+
+    def rows():
+        while feed.lines:
+            start = reader.line_num + 1
+            try:
+                values = next(reader)
+            except csv.Error as e:
+                yield start, ValueError(f"Malformed CSV: {e}")
+                continue
+            if values:
+                yield start, values
+
+    async for line_number, line in _split_lines(chunks):
+        if isinstance(line, ValueError):
+            # Keep the reader's line count in step with the body
+            yield line_number, line
+            line = ""
+        feed.lines.append(line + "\n")
+        quotes += line.count('"')
+        if quotes % 2 == 0:
+            for row in rows():
+                yield row
+            quotes = 0
+    # An unclosed quote at the end of the body
+    for row in rows():
+        yield row
+
+
+async def iter_records(chunks: AsyncIterator[bytes], content_type: str) -> AsyncIterator[Tuple[int, object]]:
+    """Yield (line number, record) for an NDJSON or CSV body.
+
+    A record is a dict for well-formed lines, or the ValueError raised while
+    parsing it so the caller can report the line and carry on. CSV records
+    are numbered by the line they start on.
+    """
+    if "csv" not in content_type:
+        async for line_number, line in iter_lines(chunks):
+            if isinstance(line, ValueError):
+                yield line_number, line
+                continue
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("Expected a JSON object")
+                yield line_number, record
+            except ValueError as e:
+                yield line_number, e
+        return
+
+    fields = None
+    async for line_number, values in iter_csv_rows(chunks):
+        if isinstance(values, ValueError):
+            yield line_number, values
+            continue
+        if fields is None:
+            # The header row is optional; without it CSV_FIELDS order applies
+            if [value.strip() for value in values][:2] == ["name", "lat"]:
+                fields = [value.strip() for value in values]
+                continue
+            fields = CSV_FIELDS
+        record = dict(zip(fields, values))
+        image_urls = record.get("image_urls")
+        record["image_urls"] = [url for url in (image_urls or "").split("|") if url]
+        yield line_number, record
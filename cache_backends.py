@@ -0,0 +1,368 @@
+"""Pluggable backends for the upstream caches, so workers can share entries.
+
+CACHE_BACKEND picks one for every cache in the process:
+  memory  - a TTLCache per cache, private to the worker (the default)
+  sqlite  - one SQLite file (CACHE_SQLITE_PATH) shared by the workers on a host
+  redis   - a Redis-protocol server (CACHE_REDIS_URL) shared by every host
+
+Shared backends store values as JSON (orjson), zlib compressed when that
+pays off, behind a one-byte header naming the format. The caches only hold
+JSON-shaped values, and JSON is safe to decode from a store shared across
+hosts and reads the same on every Python version. A shared backend that
+errors or is slower than CACHE_TIMEOUT_SECONDS counts as a miss; the caches
+in front of Postgres and Google then fall through as if it were empty.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Hashable, Iterable, List, Optional
+from urllib.parse import unquote, urlsplit
+
+import orjson
+
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "/tmp/trip-planner-cache.sqlite3")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_REDIS_POOL_SIZE = int(os.getenv("CACHE_REDIS_POOL_SIZE", "8"))
+CACHE_TIMEOUT = float(os.getenv("CACHE_TIMEOUT_SECONDS", "0.25"))
+
+# Values larger than this are compressed when compression shrinks them
+COMPRESS_THRESHOLD = 512
+_COMPRESSED = 0x01
+# The header's upper bits name the encoding, so entries in another format
+# (such as the earlier marshal ones) read as misses instead of garbage
+_FORMAT = 0x10
+
+
+def encode_value(value: Any) -> bytes:
+    payload = orjson.dumps(value)
+    if len(payload) > COMPRESS_THRESHOLD:
+        compressed = zlib.compress(payload, 1)
+        if len(compressed) < len(payload):
+            return bytes((_FORMAT | _COMPRESSED,)) + compressed
+    return bytes((_FORMAT,)) + payload
+
+
+def decode_value(data: bytes) -> Any:
+    header = data[0]
+    if header & ~_COMPRESSED != _FORMAT:
+        raise ValueError("Cache entry in an unknown format")
+    payload = data[1:]
+    if header & _COMPRESSED:
+        payload = zlib.decompress(payload)
+    return orjson.loads(payload)
+
+
+class SQLiteBackend:
+    """Entries in one SQLite file, in WAL mode so every worker can read while one writes"""
+
+    name = "sqlite"
+
+    # SQLite's default limit on bound parameters is 999
+    CHUNK_SIZE = 500
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str = CACHE_SQLITE_PATH):
+        self.path = path
+        # sqlite3 blocks, so every statement runs on one dedicated thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-sqlite")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL) WITHOUT ROWID"
+            )
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        conn = self._connect()
+        now = time.time()
+        found = {}
+        for start in range(0, len(keys), self.CHUNK_SIZE):
+            chunk = keys[start:start + self.CHUNK_SIZE]
+            found.update(conn.execute(
+                f"SELECT key, value FROM cache WHERE key IN ({','.join('?' * len(chunk))}) AND expires_at > ?",
+                (*chunk, now)
+            ).fetchall())
+        return found
+
+    def _set_many(self, entries: Dict[str, bytes], ttl: float) -> None:
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                [(key, value, now + ttl) for key, value in entries.items()]
+            )
+            self._writes += len(entries)
+            # Expired rows are skipped by reads and swept up now and then
+            if self._writes >= self.PRUNE_EVERY:
+                conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+                self._writes = 0
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _delete(self, keys: List[str]) -> None:
+        self._connect().execute(f"DELETE FROM cache WHERE key IN ({','.join('?' * len(keys))})", keys)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        return await self._run(self._get_many, keys)
+
+    async def set_many(self, entries: Dict[str, bytes], ttl: float) -> None:
+        await self._run(self._set_many, entries, ttl)
+
+    async def delete(self, keys: List[str]) -> None:
+        await self._run(self._delete, keys)
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+
+
+class RedisError(Exception):
+    """An error reply from the server"""
+
+
+def encode_command(*args) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader):
+    line = await reader.readuntil(b"\r\n")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        raise RedisError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        return (await reader.readexactly(length + 2))[:-2]
+    if kind == b"*":
+        length = int(rest)
+        if length < 0:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise RedisError(f"Unexpected reply {line!r}")
+
+
+class RedisBackend:
+    """A small RESP2 client: one pipelined round trip per cache operation, over a pool of connections"""
+
+    name = "redis"
+
+    def __init__(self, url: str = CACHE_REDIS_URL, pool_size: int = CACHE_REDIS_POOL_SIZE):
+        parsed = urlsplit(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self._slots = asyncio.Semaphore(pool_size)
+        self._idle: List[tuple] = []
+
+    async def _connect(self) -> tuple:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            writer.write(b"".join(encode_command(*command) for command in setup))
+            await writer.drain()
+            for _ in setup:
+                await read_reply(reader)
+        return reader, writer
+
+    async def pipeline(self, commands: List[tuple]) -> list:
+        """Send every command, then read every reply; errors come back in place of their reply"""
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else await self._connect()
+            reader, writer = connection
+            try:
+                writer.write(b"".join(encode_command(*command) for command in commands))
+                await writer.drain()
+                replies = []
+                for _ in commands:
+                    try:
+                        replies.append(await read_reply(reader))
+                    except RedisError as e:
+                        replies.append(e)
+            except BaseException:
+                # A half-read reply leaves the connection unusable
+                writer.close()
+                raise
+            self._idle.append(connection)
+            return replies
+
+    async def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        (values,) = await self.pipeline([("MGET", *keys)])
+        if isinstance(values, Exception):
+            raise values
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    async def set_many(self, entries: Dict[str, bytes], ttl: float) -> None:
+        ttl_ms = max(int(ttl * 1000), 1)
+        for reply in await self.pipeline([("SET", key, value, "PX", ttl_ms) for key, value in entries.items()]):
+            if isinstance(reply, Exception):
+                raise reply
+
+    async def delete(self, keys: List[str]) -> None:
+        await self.pipeline([("DEL", *keys)])
+
+    async def close(self) -> None:
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+
+class Cache:
+    """One named cache on the configured backend.
+
+    Keys may be strings or tuples; they are namespaced, so caches can share
+    one backend. With a shared backend, values round-trip through
+    encode_value, so callers get copies rather than shared objects.
+    """
+
+    def __init__(self, namespace: str, backend, ttl: float):
+        self.namespace = namespace
+        self.backend = backend
+        # In-process entries are kept as objects; only shared backends serialize
+        self.local = isinstance(backend, TTLCache)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _key(self, key: Hashable) -> str:
+        if isinstance(key, tuple):
+            key = ":".join(map(str, key))
+        return f"{self.namespace}:{key}"
+
+    async def _shared(self, operation, *args):
+        try:
+            return await asyncio.wait_for(operation(*args), CACHE_TIMEOUT)
+        except (OSError, EOFError, asyncio.IncompleteReadError, asyncio.TimeoutError, RedisError, sqlite3.Error) as e:
+            self.errors += 1
+            logger.warning("%s cache backend failed: %r", self.namespace, e)
+            return None
+
+    async def get(self, key: Hashable) -> Any:
+        return (await self.get_many([key])).get(key)
+
+    async def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """Live entries for `keys`, skipping misses"""
+        keys = list(keys)
+        if not keys:
+            return {}
+        if self.local:
+            found = self.backend.get_many(keys)
+        else:
+            names = {self._key(key): key for key in keys}
+            raw = await self._shared(self.backend.get_many, list(names)) or {}
+            found = {}
+            for name, data in raw.items():
+                try:
+                    found[names[name]] = decode_value(data)
+                except (ValueError, IndexError, zlib.error) as e:
+                    logger.warning("Unreadable %s cache entry %s: %r", self.namespace, name, e)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    async def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        await self.set_many({key: value}, ttl)
+
+    async def set_many(self, entries: Dict[Hashable, Any], ttl: Optional[float] = None) -> None:
+        if not entries:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        if self.local:
+            for key, value in entries.items():
+                self.backend.set(key, value, ttl=ttl)
+            return
+        await self._shared(
+            self.backend.set_many,
+            {self._key(key): encode_value(value) for key, value in entries.items()},
+            ttl
+        )
+
+    async def delete(self, key: Hashable) -> None:
+        if self.local:
+            self.backend.delete(key)
+            return
+        await self._shared(self.backend.delete, [self._key(key)])
+
+    def size(self) -> Optional[int]:
+        """Entries held, for in-process caches only"""
+        return len(self.backend) if self.local else None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "memory" if self.local else self.backend.name,
+            "size": self.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+
+
+_shared_backend = None
+
+
+def shared_backend():
+    """The process-wide shared backend, or None when CACHE_BACKEND is memory"""
+    global _shared_backend
+    if _shared_backend is None and CACHE_BACKEND != "memory":
+        if CACHE_BACKEND == "sqlite":
+            _shared_backend = SQLiteBackend()
+        elif CACHE_BACKEND == "redis":
+            _shared_backend = RedisBackend()
+        else:
+            raise ValueError(f"Unknown CACHE_BACKEND {CACHE_BACKEND!r}")
+    return _shared_backend
+
+
+def make_cache(namespace: str, maxsize: int, ttl: float) -> Cache:
+    """A cache on the configured backend; `maxsize` bounds the in-process backend only"""
+    backend = shared_backend() or TTLCache(maxsize=maxsize, ttl=ttl)
+    return Cache(namespace, backend, ttl)
+
+
+async def close_cache_backend() -> None:
+    global _shared_backend
+    if _shared_backend is not None:
+        await _shared_backend.close()
+        _shared_backend = None
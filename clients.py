@@ -0,0 +1,74 @@
+"""Lazily constructed, shared API clients.
+
+The openai and googlemaps packages are only imported when a client is first
+needed, so workers that only serve destinations start fast and don't need
+either API key.
+"""
+import os
+
+
+class ClientNotConfigured(RuntimeError):
+    """A client was needed but its API key is not set"""
+
+
+# Only a backstop; the googlemaps client's own throttle sleeps in the calling thread
+GOOGLE_CLIENT_QPS = int(os.getenv("GOOGLE_CLIENT_QPS", "1000"))
+# Callers stop waiting with asyncio.wait_for, which can't stop the executor
+# thread; this bounds how long a slow call keeps the thread busy
+GOOGLE_REQUEST_TIMEOUT = float(os.getenv("GOOGLE_REQUEST_TIMEOUT", "10"))
+
+_openai_client = None
+_gmaps_client = None
+
+
+def google_maps_api_key() -> str:
+    api_key = os.getenv("GOOGLE_MAPS_API_KEY")
+    if not api_key:
+        raise ClientNotConfigured("Google Maps API Key is missing.")
+    return api_key
+
+
+def google_maps_base_url() -> str:
+    # Overridable so benchmarks can point the client at a local stand-in
+    return os.getenv("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com")
+
+
+def get_openai_client():
+    """Shared AsyncOpenAI client"""
+    global _openai_client
+    if _openai_client is None:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ClientNotConfigured("OpenAI API Key is missing.")
+        from openai import AsyncOpenAI
+        _openai_client = AsyncOpenAI(api_key=api_key, organization=os.getenv("OPENAI_ORG_ID"))
+    return _openai_client
+
+
+def get_gmaps_client():
+    """Shared googlemaps.Client"""
+    global _gmaps_client
+    if _gmaps_client is None:
+        import googlemaps
+        # Pacing and OVER_QUERY_LIMIT retries are left to quota.google_scheduler,
+        # which waits without holding one of the executor's threads
+        _gmaps_client = googlemaps.Client(
+            key=google_maps_api_key(),
+            base_url=google_maps_base_url(),
+            queries_per_second=GOOGLE_CLIENT_QPS,
+            queries_per_minute=GOOGLE_CLIENT_QPS * 60,
+            retry_over_query_limit=False,
+            timeout=GOOGLE_REQUEST_TIMEOUT
+        )
+    return _gmaps_client
+
+
+async def close_clients() -> None:
+    """Release connections held by any clients created so far"""
+    global _openai_client, _gmaps_client
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
+    if _gmaps_client is not None:
+        _gmaps_client.session.close()
+        _gmaps_client = None
@@ -1,18 +1,101 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, ARRAY, BigInteger
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, DateTime, Text, ARRAY, BigInteger, Index, and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 import os
 from datetime import datetime
 import time
 
+import geo
+from metrics import record_checkout_wait, record_query
+
 # Database URL
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://localhost/motorcycle_stay_agent")
 
-# Create SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
+# Same database through asyncpg, used by the request handlers
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+)
+
+# Async connection pool sizing
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Async connection pool that reports how long each checkout waited"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            record_checkout_wait(time.perf_counter() - started)
+
+# Engines are created on first use, so importing this module (or the app)
+# never touches the database; the app's lifespan warms the pool instead
+_engine = None
+_async_engine = None
+
+def get_engine():
+    """Sync engine, used by Alembic and scripts"""
+    global _engine
+    if _engine is None:
+        _engine = create_engine(DATABASE_URL)
+        SessionLocal.configure(bind=_engine)
+    return _engine
+
+def get_async_engine():
+    """Async engine shared by the request handlers"""
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            poolclass=TimedAsyncQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_pre_ping=True
+        )
+        _instrument(_async_engine.sync_engine)
+        AsyncSessionLocal.configure(bind=_async_engine)
+    return _async_engine
+
+async def dispose_async_engine():
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
+def _instrument(sync_engine):
+    """Time every statement the request handlers run"""
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+        record_query(statement, time.perf_counter() - conn.info["query_started"].pop())
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _drop_query_timer(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+class _LazySessionMaker(sessionmaker):
+    def __call__(self, **local_kw):
+        get_engine()
+        return super().__call__(**local_kw)
+
+class _LazyAsyncSessionMaker(async_sessionmaker):
+    def __call__(self, **local_kw):
+        get_async_engine()
+        return super().__call__(**local_kw)
 
 # Create SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = _LazySessionMaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = _LazyAsyncSessionMaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 # Create Base class
 Base = declarative_base()
@@ -21,29 +104,102 @@ Base = declarative_base()
 class Destination(Base):
     __tablename__ = "destinations"
     
-    id = Column(String, primary_key=True, index=True)  # Will be generated from lat+long
+    id = Column(String, primary_key=True, index=True)  # Spatial key from lat+long, see generate_id
     name = Column(String, nullable=False)
     lat = Column(Float, nullable=False)
     long = Column(Float, nullable=False)
     image_urls = Column(ARRAY(String), default=[])  # List of image URLs
-    created_at = Column(BigInteger, default=lambda: int(time.time() * 1000))
+    created_at = Column(BigInteger, nullable=False, default=lambda: int(time.time() * 1000))
+
+    # (created_at, id) backs keyset pagination; spatial queries use the
+    # primary key, see id_range
+    __table_args__ = (
+        Index("ix_destinations_created_at_id", "created_at", "id"),
+    )
     
     @staticmethod
     def generate_id(lat: float, long: float) -> str:
-        """Generate ID from latitude and longitude coordinates"""
-        # Round to 6 decimal places (about 1 meter precision)
-        lat_rounded = round(lat, 6)
-        long_rounded = round(long, 6)
-        return f"{lat_rounded}_{long_rounded}"
+        """Generate ID from latitude and longitude coordinates.
+
+        The id is the 64-bit Morton key of the coordinates as 16 hex digits, so
+        ids are fixed width and nearby destinations share prefixes.
+        """
+        # Round to 6 decimal places (about 1 meter precision) first, so the
+        # same coordinates as before count as the same destination
+        return f"{geo.encode_morton(round(lat, 6), round(long, 6)):016x}"
+
+    @staticmethod
+    def id_range(start: int, end: int):
+        """Condition for ids whose Morton key is in [start, end), a range scan on the primary key.
+
+        Ids are fixed-width lowercase hex, so they sort in key order.
+        """
+        condition = Destination.id >= f"{start:016x}"
+        if end >= 1 << (2 * geo.MORTON_BITS):
+            return condition
+        return and_(condition, Destination.id < f"{end:016x}")
+
+    @staticmethod
+    def candidates_near(lat: float, lon: float, radius_km: float):
+        """Destinations in the cells covering a radius, for an exact distance check by the caller.
+
+        Candidates come from range scans on the primary key, whose Morton ids
+        sort by cell.
+        """
+        min_lat, max_lat, _, _ = geo.bounding_box(lat, lon, radius_km)
+        return select(Destination).where(
+            or_(*[Destination.id_range(start, end) for start, end in geo.covering_ranges(lat, lon, radius_km)]),
+            Destination.lat.between(min_lat, max_lat)
+        )
+
+    @staticmethod
+    def resolve_id(destination_id: str) -> str:
+        """Map a legacy "lat_long" id onto the current id; anything else is returned as is"""
+        lat, separator, long = destination_id.partition("_")
+        if not separator:
+            return destination_id
+        try:
+            return Destination.generate_id(float(lat), float(long))
+        except ValueError:
+            return destination_id
+
+class Stay(Base):
+    """Cached Google place details for a lodging, keyed by place_id"""
+    __tablename__ = "stays"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    place_id = Column(String, unique=True, nullable=False)
+    phone = Column(String, nullable=True)
+    photo_reference = Column(String, nullable=True)  # Google photo_reference, never a keyed URL
+    lat = Column(Float, nullable=False)
+    lng = Column(Float, nullable=False)
+    created_at = Column(BigInteger, default=lambda: int(time.time() * 1000))
+    expires_at = Column(BigInteger, nullable=False, index=True)  # Epoch millis after which the entry is stale
+
+class Itinerary(Base):
+    """Generated itineraries, kept as history and served as a cache by cache_key"""
+    __tablename__ = "itineraries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String, nullable=False)  # Prompt version and grid-snapped start/end coordinates
+    start_lat = Column(Float, nullable=False)
+    start_lng = Column(Float, nullable=False)
+    end_lat = Column(Float, nullable=False)
+    end_lng = Column(Float, nullable=False)
+    itinerary_data = Column(Text, nullable=False)
+    created_at = Column(BigInteger, default=lambda: int(time.time() * 1000))
+    expires_at = Column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        Index("ix_itineraries_cache_key_created_at", "cache_key", "created_at"),
+    )
 
 # Dependency to get database session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 # Create tables
 def create_tables():
-    Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+    Base.metadata.create_all(bind=get_engine()) 
\ No newline at end of file
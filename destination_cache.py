@@ -0,0 +1,83 @@
+"""Read-through cache for destination reads, invalidated by writes.
+
+Single destinations and list pages are cached as encoded response bodies
+with their ETag, so a hit skips both Postgres and serialization. Every write
+bumps a generation counter, and a read only stores what it fetched if no
+write happened while it was querying; otherwise a slow read could put back
+a value that a write had just replaced.
+
+Invalidation only reaches this process. With several workers, the TTL bounds
+how long another worker can keep serving a changed destination.
+"""
+import hashlib
+import os
+from typing import Dict, Hashable, NamedTuple, Optional
+
+from cache import TTLCache
+
+DESTINATION_CACHE_TTL = int(os.getenv("DESTINATION_CACHE_TTL_SECONDS", "60"))
+DESTINATION_CACHE_SIZE = int(os.getenv("DESTINATION_CACHE_SIZE", "4096"))
+DESTINATION_PAGE_CACHE_SIZE = int(os.getenv("DESTINATION_PAGE_CACHE_SIZE", "256"))
+# How long browsers and the CDN may reuse a response before revalidating
+DESTINATION_MAX_AGE = int(os.getenv("DESTINATION_MAX_AGE_SECONDS", "60"))
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+
+
+def body_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header covers `etag` (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class DestinationCache:
+    """Encoded GET /destinations/{id} and GET /destinations responses"""
+
+    def __init__(self, maxsize: int = DESTINATION_CACHE_SIZE, page_maxsize: int = DESTINATION_PAGE_CACHE_SIZE,
+                 ttl: float = DESTINATION_CACHE_TTL):
+        self.items = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.pages = TTLCache(maxsize=page_maxsize, ttl=ttl)
+        self.generation = 0
+
+    @staticmethod
+    def entry(body: bytes, headers: Optional[Dict[str, str]] = None) -> CachedBody:
+        return CachedBody(body, body_etag(body), headers or {})
+
+    def get_item(self, destination_id: str) -> Optional[CachedBody]:
+        return self.items.get(destination_id)
+
+    def set_item(self, destination_id: str, entry: CachedBody, generation: int) -> None:
+        if generation == self.generation:
+            self.items.set(destination_id, entry)
+
+    def get_page(self, key: Hashable) -> Optional[CachedBody]:
+        return self.pages.get(key)
+
+    def set_page(self, key: Hashable, entry: CachedBody, generation: int) -> None:
+        if generation == self.generation:
+            self.pages.set(key, entry)
+
+    def invalidate(self, *destination_ids: str) -> None:
+        """Drop the given destinations and every list page; call after the write commits"""
+        self.generation += 1
+        for destination_id in destination_ids:
+            self.items.delete(destination_id)
+        # Any write can shift rows between pages
+        self.pages.clear()
+
+    def stats(self) -> dict:
+        return {"items": self.items.stats(), "pages": self.pages.stats()}
+
+
+destination_cache = DestinationCache()
@@ -0,0 +1,128 @@
+"""Driving directions from Google, cached by origin/destination, plus route geometry helpers."""
+import os
+from typing import List, Optional, Tuple
+
+from cache_backends import make_cache
+from geo import haversine_km
+from places import run_blocking
+from singleflight import SingleFlight
+
+DIRECTIONS_CACHE_TTL = int(os.getenv("DIRECTIONS_CACHE_TTL_SECONDS", str(24 * 3600)))
+DIRECTIONS_CACHE_SIZE = int(os.getenv("DIRECTIONS_CACHE_SIZE", "512"))
+
+# Routes are cached per ~11 m of origin/destination
+DIRECTIONS_KEY_DECIMALS = 4
+
+directions_cache = make_cache("directions", DIRECTIONS_CACHE_SIZE, DIRECTIONS_CACHE_TTL)
+directions_flight = SingleFlight()
+
+
+def _point(location: dict) -> dict:
+    return {"lat": location["lat"], "lng": location["lng"]}
+
+
+def summarize_route(route: dict) -> dict:
+    """Reduce a Google directions route to the fields our clients use"""
+    legs = []
+    for leg in route.get("legs", []):
+        legs.append({
+            "start": _point(leg["start_location"]),
+            "end": _point(leg["end_location"]),
+            "distance_m": leg["distance"]["value"],
+            "duration_s": leg["duration"]["value"],
+            "steps": [
+                {
+                    "start": _point(step["start_location"]),
+                    "end": _point(step["end_location"]),
+                    "distance_m": step["distance"]["value"],
+                    "duration_s": step["duration"]["value"]
+                }
+                for step in leg.get("steps", [])
+            ]
+        })
+    return {
+        "summary": route.get("summary"),
+        "distance_m": sum(leg["distance_m"] for leg in legs),
+        "duration_s": sum(leg["duration_s"] for leg in legs),
+        "polyline": route.get("overview_polyline", {}).get("points"),
+        "legs": legs
+    }
+
+
+async def get_route(gmaps, origin: Tuple[float, float], destination: Tuple[float, float]) -> Optional[dict]:
+    """Driving route between two points, or None when Google finds no route"""
+    key = tuple(round(value, DIRECTIONS_KEY_DECIMALS) for value in (*origin, *destination))
+    route = await directions_cache.get(key)
+    if route is not None:
+        return route
+
+    async def fetch() -> Optional[dict]:
+        routes = await run_blocking(gmaps.directions, origin, destination, mode="driving")
+        if not routes:
+            return None
+        summary = summarize_route(routes[0])
+        await directions_cache.set(key, summary)
+        return summary
+
+    return await directions_flight.do(key, fetch)
+
+
+def sample_polyline(polyline: str, interval_km: float, max_samples: int) -> Tuple[List[dict], List[float], List[Tuple[int, float]]]:
+    """Decode a polyline and pick points roughly every `interval_km` along it.
+
+    Returns the decoded points, the cumulative distance in km at each point,
+    and the samples as (point index, distance along the route). The interval
+    is widened when the route would need more than `max_samples` samples;
+    the first and last point are always included.
+    """
+    from googlemaps.convert import decode_polyline
+
+    points = decode_polyline(polyline)
+    cumulative = [0.0]
+    for previous, point in zip(points, points[1:]):
+        cumulative.append(cumulative[-1] + haversine_km(previous["lat"], previous["lng"], point["lat"], point["lng"]))
+
+    total_km = cumulative[-1]
+    if max_samples > 1:
+        interval_km = max(interval_km, total_km / (max_samples - 1))
+
+    samples = [(0, 0.0)]
+    next_at = interval_km
+    for index, distance in enumerate(cumulative):
+        if distance >= next_at:
+            samples.append((index, distance))
+            next_at = distance + interval_km
+    if samples[-1][0] != len(points) - 1:
+        samples.append((len(points) - 1, total_km))
+    return points, cumulative, samples
+
+
+def locate_on_route(points: List[dict], cumulative: List[float], lat: float, lng: float, start: int, end: int) -> Tuple[float, float]:
+    """(distance along the route, distance from the route) in km for a point near points[start:end]"""
+    best_index = min(
+        range(start, end),
+        key=lambda index: haversine_km(lat, lng, points[index]["lat"], points[index]["lng"])
+    )
+    best = points[best_index]
+    return cumulative[best_index], haversine_km(lat, lng, best["lat"], best["lng"])
+
+
+def overnight_stops(route: dict, max_driving_s: float) -> List[dict]:
+    """Where each day's driving ends when no day may exceed `max_driving_s`.
+
+    Days end at step boundaries, so a single step longer than the limit
+    still makes up a whole day. The destination is always the last stop.
+    """
+    steps = [step for leg in route["legs"] for step in leg["steps"]]
+    stops = []
+    day_s = day_m = 0
+    for step in steps:
+        if day_s and day_s + step["duration_s"] > max_driving_s:
+            stops.append({**step["start"], "driving_s": day_s, "distance_m": day_m})
+            day_s = day_m = 0
+        day_s += step["duration_s"]
+        day_m += step["distance_m"]
+    end = route["legs"][-1]["end"] if route["legs"] else None
+    if end is not None:
+        stops.append({**end, "driving_s": day_s, "distance_m": day_m})
+    return [{"day": day, **stop} for day, stop in enumerate(stops, start=1)]
@@ -0,0 +1,148 @@
+"""Geohash and Morton encoding and great-circle helpers for spatial destination queries."""
+import math
+from typing import List, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Precision stored on destinations (~5 m cells)
+GEOHASH_PRECISION = 9
+
+# Upper bound on the number of cells a radius query may expand into
+MAX_COVERING_CELLS = 16
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Bits per axis in a Morton key (~5 mm cells)
+MORTON_BITS = 32
+
+
+def encode_geohash(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Encode a coordinate as a geohash string of `precision` characters"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value, value_range = (lon, lon_range) if even else (lat, lat_range)
+        mid = (value_range[0] + value_range[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            value_range[0] = mid
+        else:
+            bits <<= 1
+            value_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def _spread_bits(value: int) -> int:
+    """Move bit i of a 32-bit value to bit 2i"""
+    value = (value | (value << 16)) & 0x0000FFFF0000FFFF
+    value = (value | (value << 8)) & 0x00FF00FF00FF00FF
+    value = (value | (value << 4)) & 0x0F0F0F0F0F0F0F0F
+    value = (value | (value << 2)) & 0x3333333333333333
+    value = (value | (value << 1)) & 0x5555555555555555
+    return value
+
+
+def _quantize(value: float, low: float, span: float) -> int:
+    cells = 1 << MORTON_BITS
+    return min(max(int((value - low) / span * cells), 0), cells - 1)
+
+
+def encode_morton(lat: float, lon: float) -> int:
+    """Interleave 32 bits of longitude and latitude into a 64-bit Z-order key.
+
+    Longitude takes the high bit of each pair, so the bits are the same as a
+    geohash's and any leading run of them names a geohash-style cell: nearby
+    points share prefixes and sort next to each other.
+    """
+    return (_spread_bits(_quantize(lon, -180.0, 360.0)) << 1) | _spread_bits(_quantize(lat, -90.0, 180.0))
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """Height and width in degrees of a geohash cell at `precision`"""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two coordinates in kilometres"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lon, max_lon) enclosing a circle around a point.
+
+    Longitudes may fall outside [-180, 180] when the circle crosses the
+    antimeridian; the full longitude range is returned when it covers a pole.
+    """
+    d_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat = max(-90.0, lat - d_lat)
+    max_lat = min(90.0, lat + d_lat)
+    if min_lat == -90.0 or max_lat == 90.0:
+        return min_lat, max_lat, -180.0, 180.0
+    d_lon = math.degrees(
+        math.asin(min(1.0, math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(lat))))
+    )
+    return min_lat, max_lat, lon - d_lon, lon + d_lon
+
+
+def covering_cells(lat: float, lon: float, radius_km: float) -> List[str]:
+    """Geohash prefixes that together cover every point within `radius_km`.
+
+    Uses the finest precision that needs at most MAX_COVERING_CELLS cells, so
+    each prefix is an index range scan and the union stays small.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        cell_h, cell_w = cell_size(precision)
+        rows = range(math.floor(min_lat / cell_h), math.floor(max_lat / cell_h) + 1)
+        cols = range(math.floor(min_lon / cell_w), math.floor(max_lon / cell_w) + 1)
+        if len(rows) * len(cols) <= MAX_COVERING_CELLS:
+            break
+
+    # Encode the centre of every grid cell the box touches, wrapping
+    # longitudes that spill over the antimeridian
+    cells = set()
+    for row in rows:
+        cell_lat = min(90.0, (row + 0.5) * cell_h)
+        for col in cols:
+            cell_lon = ((col + 0.5) * cell_w + 180.0) % 360.0 - 180.0
+            cells.add(encode_geohash(cell_lat, cell_lon, precision))
+    return sorted(cells)
+
+
+def covering_ranges(lat: float, lon: float, radius_km: float) -> List[Tuple[int, int]]:
+    """Morton key ranges [start, end) that together cover every point within `radius_km`.
+
+    A geohash cell of n characters is the set of keys sharing its leading
+    5n bits, so each covering cell becomes one range; adjacent ranges are
+    merged. Destination ids round coordinates to 6 decimals, so the radius
+    is padded to keep points on the edge inside the covering.
+    """
+    ranges = []
+    for cell in covering_cells(lat, lon, radius_km + 0.001):
+        prefix = 0
+        for char in cell:
+            prefix = (prefix << 5) | _BASE32.index(char)
+        shift = 2 * MORTON_BITS - 5 * len(cell)
+        start, end = prefix << shift, (prefix + 1) << shift
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
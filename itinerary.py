@@ -0,0 +1,187 @@
+"""Caching and streaming helpers for generated itineraries."""
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache_backends import make_cache
+from database import Itinerary
+
+logger = logging.getLogger(__name__)
+
+# Requests whose coordinates snap to the same grid cell share one itinerary
+ITINERARY_GRID_DEGREES = float(os.getenv("ITINERARY_GRID_DEGREES", "0.01"))
+ITINERARY_CACHE_TTL = int(os.getenv("ITINERARY_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+ITINERARY_CACHE_SIZE = int(os.getenv("ITINERARY_CACHE_SIZE", "256"))
+# Prefixed to cache keys; bump it when the prompt changes what gets generated
+ITINERARY_PROMPT_VERSION = "v2"
+
+
+def snap(value: float, grid: float) -> float:
+    """Snap a coordinate to the nearest multiple of `grid`"""
+    return round(round(value / grid) * grid, 6)
+
+
+class ItineraryCache:
+    """Itinerary cache: a CACHE_BACKEND cache in front of the itineraries table.
+
+    Every generation is appended to the table, so it doubles as history; the
+    newest unexpired row for a key is what gets served.
+    """
+
+    def __init__(self, grid: float = ITINERARY_GRID_DEGREES, ttl: int = ITINERARY_CACHE_TTL, maxsize: int = ITINERARY_CACHE_SIZE):
+        self.grid = grid
+        self.ttl = ttl
+        self.memory = make_cache("itineraries", maxsize, ttl)
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def key_for(self, req) -> str:
+        return ":".join([ITINERARY_PROMPT_VERSION] + [
+            f"{snap(value, self.grid):.6f}"
+            for value in (req.start_lat, req.start_lng, req.end_lat, req.end_lng)
+        ])
+
+    async def get(self, db: AsyncSession, key: str) -> Optional[str]:
+        itinerary_data = await self.memory.get(key)
+        if itinerary_data is not None:
+            self.memory_hits += 1
+            return itinerary_data
+
+        now_ms = int(time.time() * 1000)
+        result = await db.execute(
+            select(Itinerary).where(
+                Itinerary.cache_key == key,
+                Itinerary.expires_at > now_ms
+            ).order_by(Itinerary.created_at.desc()).limit(1)
+        )
+        row = result.scalars().first()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.db_hits += 1
+        await self.memory.set(key, row.itinerary_data, ttl=(row.expires_at - now_ms) / 1000)
+        return row.itinerary_data
+
+    async def expiries(self, db: AsyncSession, keys: List[str]) -> Dict[str, int]:
+        """When the newest entry for each key expires (epoch ms); expired and missing keys are left out"""
+        now_ms = int(time.time() * 1000)
+        result = await db.execute(
+            select(Itinerary.cache_key, func.max(Itinerary.expires_at))
+            .where(Itinerary.cache_key.in_(keys), Itinerary.expires_at > now_ms)
+            .group_by(Itinerary.cache_key)
+        )
+        return dict(result.all())
+
+    async def set(self, db: AsyncSession, key: str, req, itinerary_data: str) -> None:
+        await self.memory.set(key, itinerary_data)
+
+        now_ms = int(time.time() * 1000)
+        db.add(Itinerary(
+            cache_key=key,
+            start_lat=req.start_lat,
+            start_lng=req.start_lng,
+            end_lat=req.end_lat,
+            end_lng=req.end_lng,
+            itinerary_data=itinerary_data,
+            created_at=now_ms,
+            expires_at=now_ms + self.ttl * 1000
+        ))
+        try:
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.warning("Failed to persist itinerary %s: %r", key, e)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.db_hits + self.misses
+        hits = self.memory_hits + self.db_hits
+        return {
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "memory_size": self.memory.size()
+        }
+
+
+itinerary_cache = ItineraryCache()
+
+
+def day_end_points(itinerary_data: Optional[str]) -> List[Tuple[float, float]]:
+    """(lat, lng) where each day of a generated itinerary ends; empty if it can't be read"""
+    try:
+        return [(day["end"]["lat"], day["end"]["long"]) for day in json.loads(itinerary_data)["itinerary"]]
+    except (TypeError, ValueError, KeyError):
+        return []
+
+
+def is_complete_itinerary(itinerary_data: Optional[str]) -> bool:
+    """Whether generated arguments parse as JSON with an `itinerary` list, e.g. not cut off mid-stream"""
+    try:
+        return isinstance(json.loads(itinerary_data)["itinerary"], list)
+    except (TypeError, ValueError, KeyError):
+        return False
+
+
+class ItineraryDayParser:
+    """Incrementally parse streamed `generate_itinerary` tool-call arguments.
+
+    The arguments arrive as fragments of `{"itinerary": [{...}, {...}]}`.
+    `feed` scans each fragment once and returns every day object that closed
+    within it, so days can be sent on before the rest of the array arrives.
+    """
+
+    # Container stack while inside a day: root object, itinerary array, day
+    _DAY_DEPTH = ["{", "[", "{"]
+
+    def __init__(self):
+        self.arguments = ""
+        self._buffer = ""
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._day_start = None
+
+    def feed(self, fragment: str) -> List[dict]:
+        self.arguments += fragment
+        self._buffer += fragment
+        days = []
+
+        while self._pos < len(self._buffer):
+            char = self._buffer[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._stack.append(char)
+                if self._stack == self._DAY_DEPTH:
+                    self._day_start = self._pos
+            elif char in "}]":
+                if self._stack == self._DAY_DEPTH and self._day_start is not None:
+                    days.append(json.loads(self._buffer[self._day_start:self._pos + 1]))
+                    self._day_start = None
+                if self._stack:
+                    self._stack.pop()
+            self._pos += 1
+
+        # Only text belonging to an unfinished day needs to be kept around
+        keep_from = self._day_start if self._day_start is not None else self._pos
+        self._buffer = self._buffer[keep_from:]
+        self._pos -= keep_from
+        if self._day_start is not None:
+            self._day_start = 0
+        return days
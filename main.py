@@ -1,33 +1,123 @@
-from fastapi import FastAPI, HTTPException, Query, Depends
-from pydantic import BaseModel
-from openai import OpenAI
-import googlemaps
+from dotenv import load_dotenv
+import os
+
+# Load environment variables before importing modules that read them
+if os.environ.get("RENDER") != "true":
+    load_dotenv()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Depends, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, field_validator
+import httpx
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from typing import Optional, List
-from sqlalchemy.orm import Session
+import asyncio
+import base64
+import gzip
+import json
+import logging
+import time
+import orjson
+from sqlalchemy import delete, select, text, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+try:
+    import brotli
+except ImportError:  # optional; NDJSON pages fall back to gzip
+    brotli = None
 
 # Import database models and session
-from database import get_db, Destination
+from database import get_db, Destination, AsyncSessionLocal, dispose_async_engine, get_async_engine
+from bulk import iter_records
+from cache_backends import close_cache_backend
+from clients import ClientNotConfigured, close_clients, get_gmaps_client, get_openai_client
+from destination_cache import DESTINATION_MAX_AGE, CachedBody, destination_cache, etag_matches
+from directions import directions_cache, directions_flight, get_route, locate_on_route, overnight_stops, sample_polyline
+import geo
+from itinerary import ItineraryDayParser, is_complete_itinerary, itinerary_cache
+from metrics import REQUEST_LATENCY, record_openai_usage, server_timing, start_profile, stats_collector, track_upstream
+from photos import PhotoCache, PhotoNotFound, photo_etag, read_chunks, sniff_content_type
+from places import get_stay_details, place_details_cache, run_blocking
+from prewarm import PREWARM_ENABLED, Prewarmer, Trip
+from quota import QuotaExceeded, google_scheduler
+from singleflight import SingleFlight
+from tool_graph import GraphRun, ToolGraph
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
 
-from dotenv import load_dotenv
-import os
-load_dotenv()
+# Connections opened at startup so the first requests don't pay for the handshake
+DB_WARM_CONNECTIONS = int(os.getenv("DB_WARM_CONNECTIONS", "5"))
 
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
+photo_cache = PhotoCache()
 
-# Load environment variables
-if os.environ.get("RENDER") != "true":
-    load_dotenv()
+async def warm_pool(connections: int) -> None:
+    """Open pool connections concurrently ahead of the first requests"""
+    engine = get_async_engine()
+
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    try:
+        await asyncio.gather(*(ping() for _ in range(connections)))
+    except Exception as e:
+        logger.warning("Database pool warm-up failed: %r", e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await warm_pool(DB_WARM_CONNECTIONS)
+    if PREWARM_ENABLED:
+        prewarmer.start()
+    yield
+    await prewarmer.stop()
+    await close_clients()
+    await photo_cache.close()
+    await close_cache_backend()
+    await dispose_async_engine()
+
+app = FastAPI(lifespan=lifespan)
+
+@app.exception_handler(ClientNotConfigured)
+async def client_not_configured(request: Request, exc: ClientNotConfigured):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
 
+@app.exception_handler(QuotaExceeded)
+async def quota_exceeded(request: Request, exc: QuotaExceeded):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
 
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    """Record per-route latency, and return a timing breakdown when X-Profile is set"""
+    profile = start_profile() if request.headers.get("x-profile") else None
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - started
+        route = request.scope.get("route")
+        REQUEST_LATENCY.labels(request.method, route.path if route else "unmatched", status).observe(elapsed)
+
+    if profile is not None:
+        response.headers["Server-Timing"] = server_timing(profile, elapsed)
+    return response
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus metrics"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    organization=os.getenv("OPENAI_ORG_ID")
-)
+# Coalesce identical concurrent upstream calls
+itinerary_flight = SingleFlight()
+stays_flight = SingleFlight()
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
 
 function_def = {
     "type": "function",
@@ -76,18 +166,34 @@ function_def = {
 }
 
 
+# Google caps a nearby search at three pages, and a next_page_token only
+# becomes valid a couple of seconds after it is issued
+STAYS_MAX_PAGES = 3
+NEXT_PAGE_TOKEN_DELAY = float(os.getenv("NEXT_PAGE_TOKEN_DELAY", "2"))
+NEXT_PAGE_TOKEN_RETRIES = 3
+
+# Route-corridor stays search limits
+ROUTE_STAYS_CONCURRENCY = int(os.getenv("ROUTE_STAYS_CONCURRENCY", "8"))
+ROUTE_MAX_SAMPLES = int(os.getenv("ROUTE_MAX_SAMPLES", "40"))
+# Upper bound on overnight stops (and so stays searches) per POST /plan
+PLAN_MAX_STOPS = int(os.getenv("PLAN_MAX_STOPS", "30"))
+
+# Batch itinerary generation limits
+ITINERARY_BATCH_CONCURRENCY = int(os.getenv("ITINERARY_BATCH_CONCURRENCY", "5"))
+ITINERARY_BATCH_MAX_SIZE = int(os.getenv("ITINERARY_BATCH_MAX_SIZE", "100"))
+
 class ItineraryRequest(BaseModel):
     start_lat: float
     start_lng: float
     end_lat: float
     end_lng: float
 
-@app.post("/generate-itinerary")
-async def generate_itinerary(req: ItineraryRequest):
+def build_messages(req: ItineraryRequest) -> list:
+    """Chat messages asking the model for an itinerary"""
     prompt = f"""
 You are a travel planner specialized in planning road trips for people who travel with their own vehicles, such as motorcycles or cars. Your users only travel to hilly or mountainous regions and prefer scenic, adventure-filled routes.
 
-Plan a road trip itinerary from Delhi to Gurez Valley. The plan should consider distance and terrain and break the journey into multiple days if required. 
+Plan a road trip itinerary from the start point (lat {req.start_lat}, long {req.start_lng}) to the destination (lat {req.end_lat}, long {req.end_lng}). The plan should consider distance and terrain and break the journey into multiple days if required. The first day starts at the start point and the last day ends at the destination.
 
 For each day, specify:
 - The distance to be covered
@@ -119,37 +225,206 @@ json
 
 Please provide the JSON response **without any markdown formatting or code blocks**. Just raw JSON.
 """
+    return [
+        {"role": "system", "content": "You are a travel itinerary generator."},
+        {"role": "user", "content": prompt}
+    ]
 
-
+@app.post("/generate-itinerary")
+async def generate_itinerary(
+    req: ItineraryRequest,
+    refresh: bool = Query(False, description="Bypass the itinerary cache and generate a fresh itinerary")
+):
     try:
-        response = client.chat.completions.create(
+        return await resolve_itinerary(req, refresh)
+    except ClientNotConfigured:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/generate-itinerary/batch")
+async def generate_itinerary_batch(
+    reqs: List[ItineraryRequest],
+    refresh: bool = Query(False, description="Bypass the itinerary cache and generate fresh itineraries")
+):
+    """Generate itineraries for many routes at once.
+
+    Results stream back as NDJSON in completion order, one line per request
+    tagged with its `index`, carrying either `itinerary` or `error`.
+    """
+    if len(reqs) > ITINERARY_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"A batch can hold at most {ITINERARY_BATCH_MAX_SIZE} requests")
+
+    semaphore = asyncio.Semaphore(ITINERARY_BATCH_CONCURRENCY)
+
+    async def run_one(index: int, req: ItineraryRequest) -> dict:
+        async with semaphore:
+            try:
+                return {"index": index, "itinerary": await resolve_itinerary(req, refresh)}
+            except Exception as e:
+                return {"index": index, "error": str(e)}
+
+    async def generate_results():
+        tasks = [asyncio.ensure_future(run_one(index, req)) for index, req in enumerate(reqs)]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield json.dumps(await next_result) + "\n"
+        finally:
+            # Stop outstanding work if the client goes away
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(generate_results(), media_type="application/x-ndjson")
+
+async def resolve_itinerary(req: ItineraryRequest, refresh: bool = False) -> Optional[str]:
+    """Serve an itinerary from the cache, or generate it"""
+    # Nearby start/end pairs share a cache entry. The session is only held
+    # for the lookup, not for the length of the OpenAI call.
+    cache_key = itinerary_cache.key_for(req)
+    if not refresh:
+        async with AsyncSessionLocal() as db:
+            cached = await itinerary_cache.get(db, cache_key)
+        if cached is not None:
+            return cached
+
+    # Identical requests already being generated share that call
+    return await itinerary_flight.do(cache_key, create_itinerary, req, cache_key)
+
+async def create_itinerary(req: ItineraryRequest, cache_key: str) -> Optional[str]:
+    """Generate an itinerary with OpenAI and store it in the cache"""
+    with track_upstream("openai", "chat.completions"):
+        response = await get_openai_client().chat.completions.create(
             model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a travel itinerary generator."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=build_messages(req),
             tools=[function_def],
             tool_choice="auto"
         )
-        return response.choices[0].message.content
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    record_openai_usage("gpt-4o", response.usage)
+    itinerary_data = response.choices[0].message.content
+
+    # The call may be shared by several requests, so it writes through its
+    # own session rather than one tied to a single request
+    if itinerary_data:
+        async with AsyncSessionLocal() as db:
+            await itinerary_cache.set(db, cache_key, req, itinerary_data)
+    return itinerary_data
+
+@app.post("/generate-itinerary/stream")
+async def stream_itinerary(
+    req: ItineraryRequest,
+    refresh: bool = Query(False, description="Bypass the itinerary cache and generate a fresh itinerary")
+):
+    """Stream the itinerary as NDJSON, one day per line as soon as it is generated"""
+    cache_key = itinerary_cache.key_for(req)
+
+    # The generator opens its own short sessions: the dependency session may
+    # be closed before the body finishes streaming, and none is held open
+    # while OpenAI generates
+    async def generate_days():
+        if not refresh:
+            async with AsyncSessionLocal() as db:
+                cached = await itinerary_cache.get(db, cache_key)
+            if cached is not None:
+                try:
+                    days = json.loads(cached).get("itinerary", [])
+                except (ValueError, AttributeError):
+                    days = None
+                if days:
+                    for day in days:
+                        yield json.dumps(day) + "\n"
+                    return
 
+        parser = ItineraryDayParser()
+        try:
+            with track_upstream("openai", "chat.completions.stream"):
+                stream = await get_openai_client().chat.completions.create(
+                    model="gpt-4o",
+                    messages=build_messages(req),
+                    tools=[function_def],
+                    tool_choice={"type": "function", "function": {"name": "generate_itinerary"}},
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+            async for chunk in stream:
+                # Usage arrives on a final chunk with no choices
+                record_openai_usage("gpt-4o", chunk.usage)
+                if not chunk.choices:
+                    continue
+                for tool_call in chunk.choices[0].delta.tool_calls or []:
+                    if tool_call.function and tool_call.function.arguments:
+                        for day in parser.feed(tool_call.function.arguments):
+                            yield json.dumps(day) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+            return
+
+        # A stream cut off by the length limit leaves truncated arguments,
+        # which must not be served from the cache
+        if not is_complete_itinerary(parser.arguments):
+            logger.warning("Not caching incomplete streamed itinerary for %s", cache_key)
+            yield json.dumps({"error": "Itinerary generation ended before the itinerary was complete"}) + "\n"
+            return
+        async with AsyncSessionLocal() as db:
+            await itinerary_cache.set(db, cache_key, req, parser.arguments)
+
+    return StreamingResponse(generate_days(), media_type="application/x-ndjson")
 
-api_key = os.getenv("GOOGLE_MAPS_API_KEY")
-if not api_key:
-    raise ValueError("Google Maps API Key is missing.")
-gmaps = googlemaps.Client(key=api_key)
 
 @app.get("/stays")
-def get_stays(
+async def get_stays(
+    request: Request,
     lat: float = Query(..., description="Latitude of the location"),
     lon: float = Query(..., description="Longitude of the location"),
     radius: int = Query(6000, description="Search radius in meters"),
-    page_token: Optional[str] = Query(None, description="Google Places API next_page_token")
+    page_token: Optional[str] = Query(None, description="Google Places API next_page_token"),
+    all_pages: bool = Query(False, description="Fetch every result page server-side and return them merged")
 ):
-    stays = []
+    # Concurrent searches for the same spot share one set of Google calls
+    key = (round(lat, 6), round(lon, 6), radius, page_token, all_pages)
+    result = await stays_flight.do(key, find_all_stays if all_pages else find_stays, lat, lon, radius, page_token)
+    return with_absolute_photo_urls(result, request)
+
+async def find_stays(lat: float, lon: float, radius: int, page_token: Optional[str], fresh_for: float = 0) -> dict:
+    """Search Google for lodging around a point and resolve contact details"""
+    places_result = await search_places(lat, lon, radius, page_token)
+    return {
+        "stays": await build_stays(places_result.get("results", []), fresh_for),
+        "next_page_token": places_result.get("next_page_token")
+    }
+
+async def find_all_stays(lat: float, lon: float, radius: int, page_token: Optional[str]) -> dict:
+    """Follow next_page_token server-side and merge every page of stays.
+
+    Details for a page are resolved in the background while we wait for the
+    next page's token to become valid.
+    """
+    page_tasks = []
+    try:
+        for _ in range(STAYS_MAX_PAGES):
+            places_result = await search_places(lat, lon, radius, page_token)
+            page_tasks.append(asyncio.ensure_future(build_stays(places_result.get("results", []))))
+            page_token = places_result.get("next_page_token")
+            if not page_token:
+                break
+            # Google rejects a fresh token for a short while
+            await asyncio.sleep(NEXT_PAGE_TOKEN_DELAY)
+        pages = await asyncio.gather(*page_tasks)
+    except BaseException:
+        for task in page_tasks:
+            task.cancel()
+        raise
 
+    stays = {}
+    for page in pages:
+        for stay in page:
+            stays.setdefault(stay["place_id"], stay)
+    return {
+        "stays": list(stays.values()),
+        "next_page_token": None
+    }
+
+async def search_places(lat: float, lon: float, radius: int, page_token: Optional[str]) -> dict:
+    """One page of nearby lodging from Google Places"""
     # Build search request
     search_args = {
         "location": (lat, lon),
@@ -159,39 +434,281 @@ def get_stays(
     if page_token:
         search_args["page_token"] = page_token
 
-    # Call Google Maps Places API
-    places_result = gmaps.places_nearby(**search_args)
+    from googlemaps.exceptions import ApiError
 
-    for place in places_result.get("results", []):
+    # Call Google Maps Places API, retrying while a page token is not valid yet
+    gmaps = get_gmaps_client()
+    for attempt in range(NEXT_PAGE_TOKEN_RETRIES + 1):
+        try:
+            return await run_blocking(gmaps.places_nearby, **search_args)
+        except ApiError as e:
+            if not page_token or e.status != "INVALID_REQUEST" or attempt == NEXT_PAGE_TOKEN_RETRIES:
+                raise
+            await asyncio.sleep(NEXT_PAGE_TOKEN_DELAY / 2)
+
+async def build_stays(places: List[dict], fresh_for: float = 0) -> List[dict]:
+    """Turn nearby search results into stays with phone and photo.
+
+    Cached details expiring within `fresh_for` seconds are fetched again.
+    """
+    stays = []
+
+    # Look up details for all places at once, serving repeats from the cache;
+    # failed lookups come back as None
+    details_results = await get_stay_details(get_gmaps_client(), places, fresh_for)
+
+    for place, details in zip(places, details_results):
         name = place.get("name")
         place_id = place.get("place_id")
+        location = place.get("geometry", {}).get("location", {})
+        details = details or {}
 
-        details = gmaps.place(
-            place_id=place_id,
-            fields=["formatted_phone_number", "photo"]
-        )
-        result = details.get("result", {})
+        phone = details.get("phone") or "Phone not available"
 
-        phone = result.get("formatted_phone_number", "Phone not available")
-
-        # Build photo URL
+        # Point at our photo proxy so the API key never reaches clients
         photo_url = None
-        photos = result.get("photos")
-        if photos:
-            photo_ref = photos[0].get("photo_reference")
-            if photo_ref:
-                photo_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=400&photoreference={photo_ref}&key={api_key}"
+        photo_ref = details.get("photo_reference")
+        if photo_ref:
+            photo_url = app.url_path_for("get_photo", photo_reference=photo_ref)
 
         stays.append({
             "name": name,
             "phone": phone,
             "photo_url": photo_url or "No photo available",
-            "place_id": place_id 
+            "place_id": place_id,
+            "lat": location.get("lat"),
+            "lng": location.get("lng")
         })
 
+    return stays
+
+@app.get("/directions")
+async def get_directions(
+    origin_lat: float = Query(..., description="Latitude of the origin"),
+    origin_lng: float = Query(..., description="Longitude of the origin"),
+    destination_lat: float = Query(..., description="Latitude of the destination"),
+    destination_lng: float = Query(..., description="Longitude of the destination")
+):
+    """Driving route between two points, cached by origin/destination"""
+    route = await get_route(get_gmaps_client(), (origin_lat, origin_lng), (destination_lat, destination_lng))
+    if route is None:
+        raise HTTPException(status_code=404, detail="No route found")
+    return route
+
+@app.get("/stays/along-route")
+async def get_stays_along_route(
+    request: Request,
+    origin_lat: float = Query(..., description="Latitude of the origin"),
+    origin_lng: float = Query(..., description="Longitude of the origin"),
+    destination_lat: float = Query(..., description="Latitude of the destination"),
+    destination_lng: float = Query(..., description="Longitude of the destination"),
+    interval_km: float = Query(25, gt=0, description="Distance between search points along the route"),
+    radius: int = Query(6000, description="Search radius in meters around each point")
+):
+    """Stays near the driving route, ordered by how far along the route they are"""
+    route = await get_route(get_gmaps_client(), (origin_lat, origin_lng), (destination_lat, destination_lng))
+    if route is None:
+        raise HTTPException(status_code=404, detail="No route found")
+
+    points, cumulative, samples = sample_polyline(route["polyline"], interval_km, ROUTE_MAX_SAMPLES)
+    semaphore = asyncio.Semaphore(ROUTE_STAYS_CONCURRENCY)
+
+    async def search(index: int) -> Optional[dict]:
+        point = points[samples[index][0]]
+        key = (round(point["lat"], 6), round(point["lng"], 6), radius, None, False)
+        async with semaphore:
+            try:
+                return await stays_flight.do(key, find_stays, point["lat"], point["lng"], radius, None)
+            except Exception as e:
+                logger.warning("Stays lookup along route failed at %s: %r", point, e)
+                return None
+
+    results = await asyncio.gather(*(search(index) for index in range(len(samples))))
+
+    # Deduplicate by place_id and place each stay on the stretch of route
+    # between the samples either side of the one that found it
+    stays = {}
+    for index, result in enumerate(results):
+        if result is None:
+            continue
+        start = samples[max(index - 1, 0)][0]
+        end = samples[min(index + 1, len(samples) - 1)][0] + 1
+        for stay in result["stays"]:
+            if stay["place_id"] in stays or stay["lat"] is None:
+                continue
+            along_km, off_km = locate_on_route(points, cumulative, stay["lat"], stay["lng"], start, end)
+            stays[stay["place_id"]] = {
+                **stay,
+                "distance_along_route_km": round(along_km, 2),
+                "distance_from_route_km": round(off_km, 2)
+            }
+
+    ranked = sorted(stays.values(), key=lambda stay: (stay["distance_along_route_km"], stay["distance_from_route_km"]))
+    return with_absolute_photo_urls({
+        "route": {key: route[key] for key in ("summary", "distance_m", "duration_s")},
+        "stays": ranked,
+        "failed_searches": sum(result is None for result in results)
+    }, request)
+
+async def prewarm_itinerary(trip: Trip, refresh: bool) -> Optional[str]:
+    return await resolve_itinerary(ItineraryRequest(**trip._asdict()), refresh)
+
+async def prewarm_stays(lat: float, lng: float, fresh_for: float) -> dict:
+    # Not shared through stays_flight: flights run in the interactive lane,
+    # and this search should stay behind user traffic. The details it
+    # fetches land in the place details cache for the default /stays radius.
+    return await find_stays(lat, lng, 6000, None, fresh_for=fresh_for)
+
+prewarmer = Prewarmer(prewarm_itinerary, prewarm_stays)
+
+# Tool graph run by POST /plan
+tool_graph = ToolGraph.load()
+
+class PlanPreferences(BaseModel):
+    """Overrides for the UserPreferences memory node; unset fields keep the graph's values"""
+    max_hours_highway: Optional[float] = Field(None, gt=0, le=24)
+    max_hours_mountains: Optional[float] = Field(None, gt=0, le=24)
+    min_stays_with_contact: Optional[int] = Field(None, ge=0, le=20)
+    exploration_required: Optional[bool] = None
+
+    class Config:
+        extra = "forbid"
+
+class PlanRequest(ItineraryRequest):
+    radius: int = 6000
+    preferences: PlanPreferences = PlanPreferences()
+
+async def plan_preferences(node: dict, inputs: dict, context: dict) -> dict:
+    """UserPreferences memory node, with the request's overrides applied"""
+    return {**node.get("data", {}), **context["request"].preferences.model_dump(exclude_none=True)}
+
+async def plan_directions(node: dict, inputs: dict, context: dict) -> dict:
+    req = context["request"]
+    route = await get_route(get_gmaps_client(), (req.start_lat, req.start_lng), (req.end_lat, req.end_lng))
+    if route is None:
+        raise HTTPException(status_code=404, detail="No route found")
+    return route
+
+async def plan_stays(node: dict, inputs: dict, context: dict) -> List[dict]:
+    """Stays around the end of each day's driving"""
+    preferences = inputs["UserPreferences"]
+    # Routes don't say which stretches are highway and which are mountain
+    # roads, so the stricter limit applies to the whole trip
+    max_hours = min(preferences.get("max_hours_highway", 6), preferences.get("max_hours_mountains", 6))
+    min_with_contact = preferences.get("min_stays_with_contact", 0)
+    radius = context["request"].radius
+    semaphore = asyncio.Semaphore(ROUTE_STAYS_CONCURRENCY)
+
+    async def search(stop: dict) -> dict:
+        key = (round(stop["lat"], 6), round(stop["lng"], 6), radius, None, False)
+        async with semaphore:
+            try:
+                result = await stays_flight.do(key, find_stays, stop["lat"], stop["lng"], radius, None)
+            except Exception as e:
+                logger.warning("Stays lookup for overnight stop failed at %s: %r", stop, e)
+                return {**stop, "stays": [], "search_failed": True, "enough_stays": False}
+        with_contact = sum(stay["phone"] != "Phone not available" for stay in result["stays"])
+        return {**stop, "stays": result["stays"], "search_failed": False, "enough_stays": with_contact >= min_with_contact}
+
+    stops = overnight_stops(inputs["DirectionsTool"], max_hours * 3600)
+    if len(stops) > PLAN_MAX_STOPS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"The route needs {len(stops)} overnight stops at {max_hours:g} hours a day; at most {PLAN_MAX_STOPS} are planned"
+        )
+    return await asyncio.gather(*(search(stop) for stop in stops))
+
+async def plan_goal(node: dict, inputs: dict, context: dict) -> dict:
+    route = inputs["DirectionsTool"]
     return {
-        "stays": stays,
-        "next_page_token": places_result.get("next_page_token")
+        "goal": node["name"],
+        "params": node.get("params", {}),
+        "preferences": inputs["UserPreferences"],
+        "route": {key: route[key] for key in ("summary", "distance_m", "duration_s")},
+        "stops": inputs["PlacesTool"]
+    }
+
+PLAN_HANDLERS = {
+    "UserPreferences": plan_preferences,
+    "DirectionsTool": plan_directions,
+    "PlacesTool": plan_stays,
+    "goal": plan_goal
+}
+
+@app.post("/plan")
+async def plan_trip(req: PlanRequest, request: Request):
+    """Run the tool graph for a trip: route, then stays at each overnight stop.
+
+    Independent nodes run concurrently; `timings` has each node's start and
+    duration and the critical path that bounds the total.
+    """
+    run = GraphRun(tool_graph, PLAN_HANDLERS, {"request": req})
+    outputs = await run.run()
+    goal_id = next(node_id for node_id in tool_graph.order if tool_graph.nodes[node_id]["type"] == "goal")
+    plan = outputs[goal_id]
+    return {
+        **plan,
+        "stops": [with_absolute_photo_urls(stop, request) for stop in plan["stops"]],
+        "timings": run.report()
+    }
+
+def with_absolute_photo_urls(result: dict, request: Request) -> dict:
+    """Copy of a stays result with proxy photo paths made absolute for this request"""
+    base_url = str(request.base_url).rstrip("/")
+    return {
+        **result,
+        "stays": [
+            {**stay, "photo_url": base_url + stay["photo_url"]} if stay["photo_url"].startswith("/") else stay
+            for stay in result["stays"]
+        ]
+    }
+
+@app.get("/photos/{photo_reference}")
+async def get_photo(photo_reference: str, request: Request):
+    """Serve a Google place photo from the on-disk cache"""
+    etag = photo_etag(photo_reference)
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=604800, immutable"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        f = await photo_cache.open_photo(photo_reference)
+    except PhotoNotFound:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Photo fetch failed: {e}")
+
+    # Served from the open file, which eviction can't pull out from under us
+    headers["Content-Length"] = str(os.fstat(f.fileno()).st_size)
+    return StreamingResponse(read_chunks(f), media_type=sniff_content_type(f), headers=headers)
+
+# Cache and coalescing counters exported on /metrics
+stats_collector.register("place_details", place_details_cache.stats)
+stats_collector.register("itineraries", itinerary_cache.stats)
+stats_collector.register("directions", directions_cache.stats)
+stats_collector.register("photos", photo_cache.stats)
+stats_collector.register("destination_items", destination_cache.items.stats)
+stats_collector.register("destination_pages", destination_cache.pages.stats)
+stats_collector.register("itinerary_flight", itinerary_flight.stats)
+stats_collector.register("stays_flight", stays_flight.stats)
+stats_collector.register("directions_flight", directions_flight.stats)
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    """Hit and miss counters for the upstream caches, coalesced calls and Google rate limit state"""
+    return {
+        "place_details": place_details_cache.stats(),
+        "itineraries": itinerary_cache.stats(),
+        "directions": directions_cache.stats(),
+        "coalescing": {
+            "itineraries": itinerary_flight.stats(),
+            "stays": stays_flight.stats(),
+            "directions": directions_flight.stats()
+        },
+        "photos": photo_cache.stats(),
+        "destinations": destination_cache.stats(),
+        "google_quota": google_scheduler.stats(),
+        "prewarm": prewarmer.stats()
     }
 
 # Pydantic models for Destination API
@@ -207,6 +724,14 @@ class DestinationUpdate(BaseModel):
     long: Optional[float] = None
     image_urls: Optional[List[str]] = None
 
+    @field_validator("name", "lat", "long", "image_urls")
+    @classmethod
+    def not_null(cls, value):
+        # Fields are optional to leave them unchanged, but none can be cleared
+        if value is None:
+            raise ValueError("may be omitted but not null")
+        return value
+
 class DestinationResponse(BaseModel):
     id: str
     name: str
@@ -218,85 +743,356 @@ class DestinationResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class DestinationNearResponse(DestinationResponse):
+    distance_km: float
+
+# Rows per INSERT statement; keeps bind parameters well under asyncpg's limit
+BULK_INSERT_BATCH_SIZE = 2000
+
+# Columns a destination list can be projected to with ?fields=
+DESTINATION_FIELDS = ("id", "name", "lat", "long", "image_urls", "created_at")
+# NDJSON pages smaller than this are sent uncompressed
+NDJSON_COMPRESS_MIN_BYTES = 1024
+
+def parse_fields(fields: Optional[str]) -> tuple:
+    """Requested destination columns, in canonical order"""
+    if not fields:
+        return DESTINATION_FIELDS
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested.difference(DESTINATION_FIELDS)
+    if unknown or not requested:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields {', '.join(sorted(unknown))}; choose from {', '.join(DESTINATION_FIELDS)}"
+        )
+    return tuple(name for name in DESTINATION_FIELDS if name in requested)
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Best compression the client accepts: br when brotli is installed, else gzip"""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        name, _, value = params.partition("=")
+        try:
+            quality = float(value) if name.strip() == "q" else 1.0
+        except ValueError:
+            quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    # A fixed mtime keeps the output, and so the ETag, stable
+    return gzip.compress(body, compresslevel=5, mtime=0)
+
+def encode_cursor(created_at: int, destination_id: str) -> str:
+    """Opaque keyset cursor pointing just past the given row"""
+    raw = json.dumps([created_at, destination_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, destination_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(created_at, int) or not isinstance(destination_id, str):
+        raise ValueError("Invalid cursor")
+    return created_at, destination_id
+
+def cached_response(request: Request, entry: CachedBody) -> Response:
+    """Serve an encoded destination body, or 304 when the client already has it"""
+    headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": f"public, max-age={DESTINATION_MAX_AGE}"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+async def load_destination(destination_id: str, db: AsyncSession) -> CachedBody:
+    """Encoded destination, read through the in-process cache"""
+    destination_id = Destination.resolve_id(destination_id)
+    entry = destination_cache.get_item(destination_id)
+    if entry is None:
+        generation = destination_cache.generation
+        destination = await db.get(Destination, destination_id)
+        if destination is None:
+            raise HTTPException(status_code=404, detail="Destination not found")
+        entry = destination_cache.entry(DestinationResponse.model_validate(destination).model_dump_json().encode())
+        destination_cache.set_item(destination_id, entry, generation)
+    return entry
+
 # Destination CRUD endpoints
 @app.post("/destinations", response_model=DestinationResponse)
-async def create_destination(destination: DestinationCreate, db: Session = Depends(get_db)):
+async def create_destination(destination: DestinationCreate, db: AsyncSession = Depends(get_db)):
     """Create a new destination"""
     # Generate ID from coordinates
     destination_id = Destination.generate_id(destination.lat, destination.long)
     
-    # Check if destination already exists
-    existing_destination = db.query(Destination).filter(Destination.id == destination_id).first()
-    if existing_destination:
-        raise HTTPException(status_code=400, detail="Destination with these coordinates already exists")
-    
-    # Create new destination
-    db_destination = Destination(
+    # Insert and read back in one statement; the primary key decides whether
+    # these coordinates are already taken
+    stmt = insert(Destination).values(
         id=destination_id,
         name=destination.name,
         lat=destination.lat,
         long=destination.long,
-        image_urls=destination.image_urls
-    )
-    
-    db.add(db_destination)
-    db.commit()
-    db.refresh(db_destination)
+        image_urls=destination.image_urls,
+        created_at=int(time.time() * 1000)
+    ).on_conflict_do_nothing(index_elements=[Destination.id]).returning(Destination)
+
+    result = await db.execute(stmt)
+    db_destination = result.scalars().first()
+    if db_destination is None:
+        raise HTTPException(status_code=400, detail="Destination with these coordinates already exists")
+    await db.commit()
+    destination_cache.invalidate()
     
     return db_destination
 
 @app.get("/destinations", response_model=List[DestinationResponse])
-async def get_destinations(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Get all destinations with pagination"""
-    destinations = db.query(Destination).offset(skip).limit(limit).all()
-    return destinations
+async def get_destinations(
+    request: Request,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's X-Next-Cursor header"),
+    fields: Optional[str] = Query(None, description="Comma separated columns to return, e.g. id,name,lat,long"),
+    output: str = Query("json", alias="format", pattern="^(json|ndjson)$", description="json array, or one object per line"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get all destinations with pagination.
+
+    Pages are ordered by (created_at, id). Pass the X-Next-Cursor header of a
+    page back as `cursor` to fetch the next one; `skip` still works for older
+    clients but gets slower the deeper it goes.
+
+    Only the `fields` columns are selected. `format=ndjson` pages are
+    compressed with br or gzip when the client accepts it.
+    """
+    names = parse_fields(fields)
+    encoding = choose_encoding(request.headers.get("accept-encoding", "")) if output == "ndjson" else None
+    key = (0 if cursor else skip, limit, cursor, names, output, encoding)
+    entry = destination_cache.get_page(key)
+    if entry is None:
+        generation = destination_cache.generation
+        # Rows are built from column tuples; created_at and id always come
+        # along, after the requested columns, for the next-page cursor
+        columns = names + tuple(name for name in ("created_at", "id") if name not in names)
+        query = select(*(getattr(Destination, name) for name in columns)).order_by(Destination.created_at, Destination.id)
+        if cursor:
+            try:
+                created_at, destination_id = decode_cursor(cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            # Cursors handed out before the id change still point at the right row
+            destination_id = Destination.resolve_id(destination_id)
+            query = query.where(tuple_(Destination.created_at, Destination.id) > tuple_(created_at, destination_id))
+        elif skip:
+            query = query.offset(skip)
+
+        # Fetch one extra row to know whether there is a next page
+        result = await db.execute(query.limit(limit + 1))
+        rows = result.all()
+        headers = {}
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
+
+        # zip stops at the requested columns, leaving out the cursor-only ones
+        if output == "ndjson":
+            body = b"".join(orjson.dumps(dict(zip(names, row)), option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+            headers["Content-Type"] = "application/x-ndjson"
+            headers["Vary"] = "Accept-Encoding"
+            if encoding and len(body) >= NDJSON_COMPRESS_MIN_BYTES:
+                body = compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+        else:
+            body = orjson.dumps([dict(zip(names, row)) for row in rows])
+        entry = destination_cache.entry(body, headers)
+        destination_cache.set_page(key, entry, generation)
+    return cached_response(request, entry)
+
+@app.get("/destinations/near", response_model=List[DestinationNearResponse])
+async def get_destinations_near(
+    lat: float = Query(..., ge=-90, le=90, description="Latitude of the search centre"),
+    lon: float = Query(..., ge=-180, le=180, description="Longitude of the search centre"),
+    radius_km: float = Query(50, gt=0, le=5000, description="Search radius in kilometres"),
+    limit: int = Query(20, ge=1, le=500),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get destinations within a radius, nearest first"""
+    # The exact great-circle check below drops the corners of the covering cells
+    result = await db.execute(Destination.candidates_near(lat, lon, radius_km))
+
+    nearby = []
+    for destination in result.scalars():
+        distance_km = geo.haversine_km(lat, lon, destination.lat, destination.long)
+        if distance_km <= radius_km:
+            nearby.append((distance_km, destination))
+    nearby.sort(key=lambda item: item[0])
+
+    return [
+        DestinationNearResponse(
+            **DestinationResponse.model_validate(destination).model_dump(),
+            distance_km=round(distance_km, 3)
+        )
+        for distance_km, destination in nearby[:limit]
+    ]
+
+@app.post("/destinations/bulk")
+async def bulk_create_destinations(request: Request, db: AsyncSession = Depends(get_db)):
+    """Import destinations from a streamed NDJSON or CSV body.
+
+    Rows are inserted in batches with ON CONFLICT DO NOTHING; rows whose id
+    already exists are reported under `conflicts` and invalid rows under
+    `errors`, both by line number.
+    """
+    inserted = 0
+    conflicts = []
+    errors = []
+    batch = []
+    batch_ids = set()
+
+    async def flush():
+        nonlocal inserted
+        stmt = insert(Destination).values([row for _, row in batch])
+        stmt = stmt.on_conflict_do_nothing(index_elements=[Destination.id]).returning(Destination.id)
+        result = await db.execute(stmt)
+        created = set(result.scalars().all())
+        await db.commit()
+        inserted += len(created)
+        conflicts.extend(
+            {"line": line_number, "id": row["id"]}
+            for line_number, row in batch
+            if row["id"] not in created
+        )
+        batch.clear()
+        batch_ids.clear()
+
+    content_type = request.headers.get("content-type", "")
+    async for line_number, record in iter_records(request.stream(), content_type):
+        if isinstance(record, Exception):
+            errors.append({"line": line_number, "error": str(record)})
+            continue
+        try:
+            destination = DestinationCreate.model_validate(record)
+        except ValidationError as e:
+            errors.append({"line": line_number, "error": str(e)})
+            continue
+
+        destination_id = Destination.generate_id(destination.lat, destination.long)
+        # A repeated id within one batch would make the whole insert ambiguous
+        if destination_id in batch_ids:
+            conflicts.append({"line": line_number, "id": destination_id})
+            continue
+        batch_ids.add(destination_id)
+        batch.append((line_number, {
+            "id": destination_id,
+            "name": destination.name,
+            "lat": destination.lat,
+            "long": destination.long,
+            "image_urls": destination.image_urls,
+            "created_at": int(time.time() * 1000)
+        }))
+        if len(batch) >= BULK_INSERT_BATCH_SIZE:
+            await flush()
+
+    if batch:
+        await flush()
+    if inserted:
+        destination_cache.invalidate()
+
+    return {"inserted": inserted, "conflicts": conflicts, "errors": errors}
+
+@app.get("/destinations/export")
+async def export_destinations():
+    """Stream every destination as NDJSON, ordered by (created_at, id)"""
+    columns = (Destination.id, Destination.name, Destination.lat, Destination.long, Destination.image_urls, Destination.created_at)
+
+    async def generate_rows():
+        # Server-side cursor, so memory stays flat however large the table is
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(
+                select(*columns)
+                .order_by(Destination.created_at, Destination.id)
+                .execution_options(yield_per=BULK_INSERT_BATCH_SIZE)
+            )
+            async for rows in result.partitions():
+                yield "".join(json.dumps(row._asdict()) + "\n" for row in rows)
+
+    return StreamingResponse(generate_rows(), media_type="application/x-ndjson")
 
 @app.get("/destinations/{destination_id}", response_model=DestinationResponse)
-async def get_destination(destination_id: str, db: Session = Depends(get_db)):
+async def get_destination(destination_id: str, request: Request, db: AsyncSession = Depends(get_db)):
     """Get a specific destination by ID"""
-    destination = db.query(Destination).filter(Destination.id == destination_id).first()
-    if destination is None:
-        raise HTTPException(status_code=404, detail="Destination not found")
-    return destination
+    return cached_response(request, await load_destination(destination_id, db))
 
 @app.put("/destinations/{destination_id}", response_model=DestinationResponse)
-async def update_destination(destination_id: str, destination_update: DestinationUpdate, db: Session = Depends(get_db)):
+async def update_destination(destination_id: str, destination_update: DestinationUpdate, db: AsyncSession = Depends(get_db)):
     """Update a destination"""
-    db_destination = db.query(Destination).filter(Destination.id == destination_id).first()
-    if db_destination is None:
-        raise HTTPException(status_code=404, detail="Destination not found")
-    
+    destination_id = Destination.resolve_id(destination_id)
     # Update fields if provided
     update_data = destination_update.dict(exclude_unset=True)
+    if not update_data:
+        entry = await load_destination(destination_id, db)
+        return Response(entry.body, media_type="application/json")
     
     # If lat or long is being updated, we need to generate a new ID
     if 'lat' in update_data or 'long' in update_data:
-        new_lat = update_data.get('lat', db_destination.lat)
-        new_long = update_data.get('long', db_destination.long)
-        new_id = Destination.generate_id(new_lat, new_long)
-        
-        # Check if new ID already exists (different from current)
-        if new_id != destination_id:
-            existing = db.query(Destination).filter(Destination.id == new_id).first()
-            if existing:
-                raise HTTPException(status_code=400, detail="Destination with new coordinates already exists")
-            update_data['id'] = new_id
+        new_lat = update_data.get('lat')
+        new_long = update_data.get('long')
+        if new_lat is None or new_long is None:
+            # Only one coordinate given: lock the row so the other one can't
+            # change before the UPDATE below
+            result = await db.execute(
+                select(Destination.lat, Destination.long)
+                .where(Destination.id == destination_id)
+                .with_for_update()
+            )
+            current = result.first()
+            if current is None:
+                raise HTTPException(status_code=404, detail="Destination not found")
+            new_lat = current.lat if new_lat is None else new_lat
+            new_long = current.long if new_long is None else new_long
+        update_data['id'] = Destination.generate_id(new_lat, new_long)
     
-    for field, value in update_data.items():
-        setattr(db_destination, field, value)
+    # A new id that collides with another destination fails on the primary key
+    stmt = (
+        update(Destination)
+        .where(Destination.id == destination_id)
+        .values(**update_data)
+        .returning(Destination)
+        .execution_options(synchronize_session=False)
+    )
+    try:
+        result = await db.execute(stmt)
+        db_destination = result.scalars().first()
+    except IntegrityError as e:
+        await db.rollback()
+        # Only a unique violation (SQLSTATE 23505) means the coordinates are taken
+        if getattr(e.orig, "pgcode", None) != "23505":
+            raise
+        raise HTTPException(status_code=400, detail="Destination with new coordinates already exists")
+    if db_destination is None:
+        raise HTTPException(status_code=404, detail="Destination not found")
     
-    db.commit()
-    db.refresh(db_destination)
+    await db.commit()
+    destination_cache.invalidate(destination_id, db_destination.id)
     return db_destination
 
 @app.delete("/destinations/{destination_id}")
-async def delete_destination(destination_id: str, db: Session = Depends(get_db)):
+async def delete_destination(destination_id: str, db: AsyncSession = Depends(get_db)):
     """Delete a destination"""
-    db_destination = db.query(Destination).filter(Destination.id == destination_id).first()
-    if db_destination is None:
+    destination_id = Destination.resolve_id(destination_id)
+    result = await db.execute(
+        delete(Destination).where(Destination.id == destination_id).returning(Destination.id)
+    )
+    if result.scalar() is None:
         raise HTTPException(status_code=404, detail="Destination not found")
+    await db.commit()
+    destination_cache.invalidate(destination_id)
     
-    db.delete(db_destination)
-    db.commit()
-    
-    return {"message": "Destination deleted successfully"}
\ No newline at end of file
+    return {"message": "Destination deleted successfully"}
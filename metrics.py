@@ -0,0 +1,150 @@
+"""Prometheus metrics and per-request timing breakdowns."""
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time to produce a response, by route template",
+    ["method", "route", "status"]
+)
+UPSTREAM_CALLS = Counter(
+    "upstream_calls_total",
+    "Calls to external services",
+    ["upstream", "operation", "outcome"]
+)
+UPSTREAM_LATENCY = Histogram(
+    "upstream_call_duration_seconds",
+    "Latency of calls to external services",
+    ["upstream", "operation"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+)
+OPENAI_TOKENS = Counter(
+    "openai_tokens_total",
+    "Tokens reported in OpenAI response usage",
+    ["model", "kind"]
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "SQL statement execution time",
+    ["statement"]
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent getting a connection from the pool",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 30)
+)
+GOOGLE_QUEUE_DEPTH = Gauge(
+    "google_quota_queue_depth",
+    "Google Maps calls waiting for a rate limit token",
+    ["api", "lane"]
+)
+GOOGLE_QUEUE_WAIT = Histogram(
+    "google_quota_wait_seconds",
+    "Time Google Maps calls waited for a rate limit token",
+    ["api", "lane"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+GOOGLE_QUOTA_ERRORS = Counter(
+    "google_quota_errors_total",
+    "OVER_QUERY_LIMIT responses from Google Maps, by whether the call was retried",
+    ["api", "action"]
+)
+
+# Timings for the current request when profiling was asked for
+_profile: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("profile", default=None)
+
+
+def start_profile() -> Dict[str, float]:
+    """Collect a timing breakdown for the rest of the current request"""
+    profile: Dict[str, float] = {}
+    _profile.set(profile)
+    return profile
+
+
+def record(name: str, seconds: float) -> None:
+    profile = _profile.get()
+    if profile is not None:
+        profile[name] = profile.get(name, 0.0) + seconds
+
+
+def server_timing(profile: Dict[str, float], total: float) -> str:
+    """Format a profile as a Server-Timing header value"""
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in sorted(profile.items())]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+@contextmanager
+def track_upstream(upstream: str, operation: str):
+    """Count and time one call to an external service"""
+    started = time.perf_counter()
+    outcome = "success"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        UPSTREAM_CALLS.labels(upstream, operation, outcome).inc()
+        UPSTREAM_LATENCY.labels(upstream, operation).observe(elapsed)
+        record(f"{upstream}.{operation}", elapsed)
+
+
+def record_openai_usage(model: str, usage) -> None:
+    if usage is None:
+        return
+    OPENAI_TOKENS.labels(model, "prompt").inc(usage.prompt_tokens or 0)
+    OPENAI_TOKENS.labels(model, "completion").inc(usage.completion_tokens or 0)
+
+
+def record_query(statement: str, seconds: float) -> None:
+    # Label by verb only, so the label set stays small
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+    DB_QUERY_LATENCY.labels(verb).observe(seconds)
+    record("db", seconds)
+
+
+def record_checkout_wait(seconds: float) -> None:
+    DB_POOL_CHECKOUT_WAIT.observe(seconds)
+    record("db.checkout", seconds)
+
+
+class StatsCollector:
+    """Expose the stats() dicts of our caches and single-flight groups.
+
+    Keys ending in `hits` or `misses` become lookup counters, `hit_ratio`
+    becomes a gauge, and `coalesced`/`calls` become coalescing counters.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], dict]] = {}
+
+    def register(self, name: str, stats: Callable[[], dict]) -> None:
+        self._sources[name] = stats
+
+    def collect(self):
+        lookups = CounterMetricFamily("cache_lookups", "Cache lookups by result", labels=["cache", "result"])
+        hit_ratio = GaugeMetricFamily("cache_hit_ratio", "Share of cache lookups that were hits", labels=["cache"])
+        coalesced = CounterMetricFamily("singleflight_calls", "Upstream calls made or joined", labels=["group", "kind"])
+        for name, stats_fn in self._sources.items():
+            stats = stats_fn()
+            for key, value in stats.items():
+                if key.endswith("hits") or key == "misses":
+                    lookups.add_metric([name, key], value)
+                elif key == "hit_ratio":
+                    hit_ratio.add_metric([name], value)
+                elif key in ("calls", "coalesced"):
+                    coalesced.add_metric([name, key], value)
+        yield lookups
+        yield hit_ratio
+        yield coalesced
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
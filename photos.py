@@ -0,0 +1,176 @@
+"""On-disk cache for Google place photos served through the /photos proxy."""
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from typing import AsyncIterator, BinaryIO, Optional
+
+import httpx
+
+from clients import google_maps_api_key, google_maps_base_url
+from metrics import track_upstream
+from quota import google_scheduler
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+PHOTO_CACHE_DIR = os.getenv("PHOTO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "trip-planner-photos"))
+PHOTO_CACHE_MAX_BYTES = int(os.getenv("PHOTO_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+PHOTO_MAX_WIDTH = int(os.getenv("PHOTO_MAX_WIDTH", "400"))
+PHOTO_FETCH_TIMEOUT = float(os.getenv("PHOTO_FETCH_TIMEOUT", "15"))
+
+GOOGLE_PHOTO_PATH = "/maps/api/place/photo"
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class PhotoNotFound(LookupError):
+    """Google has no photo for the given reference"""
+
+
+def photo_etag(photo_reference: str) -> str:
+    """Photos never change for a given reference, so the reference alone identifies the content"""
+    return '"' + hashlib.sha256(f"{photo_reference}:{PHOTO_MAX_WIDTH}".encode()).hexdigest()[:32] + '"'
+
+
+def sniff_content_type(f: BinaryIO) -> str:
+    head = f.read(12)
+    f.seek(0)
+    if head.startswith(b"\x89PNG"):
+        return "image/png"
+    if head.startswith(b"GIF8"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/jpeg"
+
+
+async def read_chunks(f: BinaryIO) -> AsyncIterator[bytes]:
+    """Stream an open file off the event loop, closing it at the end"""
+    try:
+        while chunk := await asyncio.to_thread(f.read, _CHUNK_SIZE):
+            yield chunk
+    finally:
+        f.close()
+
+
+class PhotoCache:
+    """Size-bounded LRU of photo files on disk.
+
+    A file's mtime is bumped on every hit, so eviction removes the least
+    recently used files first. Concurrent misses for the same reference share
+    one download, which is streamed straight to disk.
+    """
+
+    def __init__(
+        self,
+        directory: str = PHOTO_CACHE_DIR,
+        max_bytes: int = PHOTO_CACHE_MAX_BYTES
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._downloads = SingleFlight()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._size: Optional[int] = None
+
+    def _ensure_directory(self) -> None:
+        # Deferred to first use so constructing the cache never touches disk
+        if self._size is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._size = sum(entry.stat().st_size for entry in os.scandir(self.directory) if entry.is_file())
+
+    def path_for(self, photo_reference: str) -> str:
+        # Hashing keeps arbitrary references from escaping the cache directory
+        return os.path.join(self.directory, hashlib.sha256(photo_reference.encode()).hexdigest())
+
+    async def fetch(self, photo_reference: str) -> str:
+        """Return the local path of the photo, downloading it on a miss"""
+        self._ensure_directory()
+        path = self.path_for(photo_reference)
+        try:
+            os.utime(path)
+            self.hits += 1
+            return path
+        except FileNotFoundError:
+            pass
+        self.misses += 1
+        return await self._downloads.do(photo_reference, self._download, photo_reference, path)
+
+    async def open_photo(self, photo_reference: str) -> BinaryIO:
+        """Open the cached photo, downloading it on a miss.
+
+        The open file stays readable if eviction deletes it afterwards; a
+        file evicted between fetch and open is fetched again.
+        """
+        for attempt in range(2):
+            path = await self.fetch(photo_reference)
+            try:
+                return open(path, "rb")
+            except FileNotFoundError:
+                if attempt:
+                    raise
+
+    async def _download(self, photo_reference: str, path: str) -> str:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=PHOTO_FETCH_TIMEOUT, follow_redirects=True)
+
+        params = {"maxwidth": PHOTO_MAX_WIDTH, "photoreference": photo_reference, "key": google_maps_api_key()}
+        photo_url = google_maps_base_url().rstrip("/") + GOOGLE_PHOTO_PATH
+        await google_scheduler.acquire("photo")
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f, track_upstream("gmaps", "photo"):
+                async with self._client.stream("GET", photo_url, params=params) as response:
+                    if response.status_code in (400, 404):
+                        raise PhotoNotFound(photo_reference)
+                    response.raise_for_status()
+                    async for chunk in response.aiter_bytes(_CHUNK_SIZE):
+                        await asyncio.to_thread(f.write, chunk)
+                        size += len(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        self._size += size
+        if self._size > self.max_bytes:
+            await asyncio.to_thread(self._evict)
+        return path
+
+    def _evict(self) -> None:
+        """Delete least recently used files until the cache is back under 90% of its budget"""
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.is_file() and not entry.name.endswith(".part")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        size = sum(entry.stat().st_size for entry in entries)
+        target = self.max_bytes * 0.9
+        for entry in entries:
+            if size <= target:
+                break
+            try:
+                file_size = entry.stat().st_size
+                os.unlink(entry.path)
+                size -= file_size
+            except FileNotFoundError:
+                continue
+        self._size = size
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "bytes": self._size or 0,
+            "downloads": self._downloads.stats()
+        }
@@ -0,0 +1,225 @@
+"""Google Places helpers shared by the stays endpoints."""
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache_backends import make_cache
+from database import AsyncSessionLocal, Stay
+from metrics import GOOGLE_QUOTA_ERRORS, track_upstream
+from quota import GOOGLE_QUOTA_RETRIES, QuotaExceeded, google_scheduler, is_quota_error
+
+logger = logging.getLogger(__name__)
+
+# Fan-out settings for place details lookups
+PLACE_DETAILS_CONCURRENCY = int(os.getenv("PLACE_DETAILS_CONCURRENCY", "20"))
+PLACE_DETAILS_TIMEOUT = float(os.getenv("PLACE_DETAILS_TIMEOUT", "5"))
+PLACE_DETAILS_FIELDS = ["formatted_phone_number", "photo"]
+
+# Details cache settings
+PLACE_DETAILS_TTL = int(os.getenv("PLACE_DETAILS_TTL_SECONDS", str(7 * 24 * 3600)))
+PLACE_DETAILS_CACHE_SIZE = int(os.getenv("PLACE_DETAILS_CACHE_SIZE", "2048"))
+
+# The googlemaps client is blocking, so its calls run on a dedicated pool.
+# Every Google call in the process shares it (nearby searches, directions
+# and every request's details fan-out), so it is several times the
+# per-request details cap: one page must not fill it.
+GOOGLE_EXECUTOR_WORKERS = int(os.getenv("GOOGLE_EXECUTOR_WORKERS", str(PLACE_DETAILS_CONCURRENCY * 4)))
+_executor = ThreadPoolExecutor(
+    max_workers=GOOGLE_EXECUTOR_WORKERS,
+    thread_name_prefix="gmaps"
+)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking googlemaps call without stalling the event loop.
+
+    Calls wait for a token from the API's rate limit first, and are retried
+    with backoff when Google still answers OVER_QUERY_LIMIT.
+    """
+    loop = asyncio.get_running_loop()
+    api = func.__name__
+    for attempt in range(GOOGLE_QUOTA_RETRIES + 1):
+        await google_scheduler.acquire(api)
+        try:
+            with track_upstream("gmaps", api):
+                return await loop.run_in_executor(_executor, partial(func, *args, **kwargs))
+        except Exception as e:
+            if not is_quota_error(e):
+                raise
+            if attempt == GOOGLE_QUOTA_RETRIES:
+                GOOGLE_QUOTA_ERRORS.labels(api, "gave_up").inc()
+                raise QuotaExceeded(f"Google Maps {api} quota exceeded") from e
+            GOOGLE_QUOTA_ERRORS.labels(api, "retried").inc()
+            await asyncio.sleep(google_scheduler.over_quota(api, attempt))
+
+
+async def fetch_place_details(
+    gmaps,
+    place_ids: List[str],
+    concurrency: int = PLACE_DETAILS_CONCURRENCY,
+    timeout: float = PLACE_DETAILS_TIMEOUT
+) -> List[Optional[dict]]:
+    """Fetch details for every place_id concurrently.
+
+    Results come back in the same order as `place_ids`. A lookup that fails
+    or takes longer than `timeout` seconds yields None, so callers can still
+    return the places that did resolve.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch_one(place_id: str) -> Optional[dict]:
+        async with semaphore:
+            try:
+                details = await asyncio.wait_for(
+                    run_blocking(gmaps.place, place_id=place_id, fields=PLACE_DETAILS_FIELDS),
+                    timeout
+                )
+            except Exception as e:
+                logger.warning("Place details lookup failed for %s: %r", place_id, e)
+                return None
+        return details.get("result", {})
+
+    return await asyncio.gather(*(fetch_one(place_id) for place_id in place_ids))
+
+
+def _details_from_result(place: dict, result: dict) -> dict:
+    """Reduce a nearby place and its details result to the fields we cache"""
+    photo_reference = None
+    photos = result.get("photos")
+    if photos:
+        photo_reference = photos[0].get("photo_reference")
+    location = place.get("geometry", {}).get("location", {})
+    return {
+        "name": place.get("name"),
+        "phone": result.get("formatted_phone_number"),
+        "photo_reference": photo_reference,
+        "lat": location.get("lat"),
+        "lng": location.get("lng")
+    }
+
+
+class PlaceDetailsCache:
+    """Two-level cache for place details: a CACHE_BACKEND cache backed by the stays table.
+
+    Both levels honour a per-entry expiry. Lookups go through `get_many` so a
+    whole nearby page is checked with one cache round trip and at most one query.
+    """
+
+    def __init__(self, maxsize: int = PLACE_DETAILS_CACHE_SIZE, ttl: int = PLACE_DETAILS_TTL):
+        self.ttl = ttl
+        self.memory = make_cache("place_details", maxsize, ttl)
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    async def get_many(self, db: AsyncSession, place_ids: List[str], fresh_for: float = 0) -> Dict[str, dict]:
+        """Cached details by place_id; with `fresh_for`, entries expiring within that many seconds count as misses"""
+        # The memory layer doesn't expose expiries, so refreshes go to the table
+        found = {} if fresh_for else await self.memory.get_many(place_ids)
+        self.memory_hits += len(found)
+
+        remaining = [place_id for place_id in place_ids if place_id not in found]
+        if remaining:
+            now_ms = int(time.time() * 1000)
+            result = await db.execute(select(Stay).where(
+                Stay.place_id.in_(remaining),
+                Stay.expires_at > now_ms + fresh_for * 1000
+            ))
+            rows = result.scalars().all()
+            promoted = {}
+            for row in rows:
+                promoted[row.place_id] = {
+                    "name": row.name,
+                    "phone": row.phone,
+                    "photo_reference": row.photo_reference,
+                    "lat": row.lat,
+                    "lng": row.lng
+                }
+            found.update(promoted)
+            # Promote to the cache for as long as the shortest-lived row has left
+            if rows:
+                await self.memory.set_many(promoted, ttl=(min(row.expires_at for row in rows) - now_ms) / 1000)
+            self.db_hits += len(rows)
+
+        self.misses += len(set(place_ids) - found.keys())
+        return found
+
+    async def set_many(self, db: AsyncSession, entries: Dict[str, dict]) -> None:
+        if not entries:
+            return
+        await self.memory.set_many(entries)
+
+        # Rows without coordinates can't satisfy the table constraints; they
+        # still live in the memory layer.
+        now_ms = int(time.time() * 1000)
+        rows = [
+            {"place_id": place_id, "created_at": now_ms, "expires_at": now_ms + self.ttl * 1000, **details}
+            for place_id, details in entries.items()
+            if details["name"] and details["lat"] is not None and details["lng"] is not None
+        ]
+        if not rows:
+            return
+        stmt = insert(Stay).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Stay.place_id],
+            set_={
+                column: stmt.excluded[column]
+                for column in ("name", "phone", "photo_reference", "lat", "lng", "created_at", "expires_at")
+            }
+        )
+        try:
+            await db.execute(stmt)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.warning("Failed to persist place details cache: %r", e)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.db_hits + self.misses
+        hits = self.memory_hits + self.db_hits
+        return {
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "memory_size": self.memory.size()
+        }
+
+
+place_details_cache = PlaceDetailsCache()
+
+
+async def get_stay_details(gmaps, places: List[dict], fresh_for: float = 0) -> List[Optional[dict]]:
+    """Resolve cached details for a page of nearby places, fetching only the misses.
+
+    Returns one entry per place in order, or None where the Google lookup
+    failed. Cached entries expiring within `fresh_for` seconds are refetched.
+    The lookup and the write each use a short session, so no pooled
+    connection is held while Google is called.
+    """
+    place_ids = [place.get("place_id") for place in places]
+    async with AsyncSessionLocal() as db:
+        cached = await place_details_cache.get_many(db, place_ids, fresh_for)
+
+    missing = [place for place in places if place.get("place_id") not in cached]
+    fetched = await fetch_place_details(gmaps, [place.get("place_id") for place in missing])
+
+    new_entries = {
+        place.get("place_id"): _details_from_result(place, result)
+        for place, result in zip(missing, fetched)
+        if result is not None
+    }
+    if new_entries:
+        async with AsyncSessionLocal() as db:
+            await place_details_cache.set_many(db, new_entries)
+
+    resolved = {**cached, **new_entries}
+    return [resolved.get(place_id) for place_id in place_ids]
@@ -0,0 +1,257 @@
+"""Background pre-warming of itineraries and stays for known destinations.
+
+For every hub origin and destination, the worker makes sure a cached
+itinerary exists and regenerates it when it is missing or due to expire
+within PREWARM_REFRESH_BEFORE_SECONDS. After (re)generating one it prefetches
+stays around each day's end point, refetching place details that expire
+inside the same window. Trips that are missing or expire soonest go first.
+Each cycle stops generating once its itinerary or stays budget is spent.
+Google calls run in the background lane, behind user traffic.
+
+Each pass holds a Postgres advisory lock, so with several uvicorn workers
+(or the CLI running beside them) only one pass runs at a time and the
+budgets apply once per cycle rather than once per process. The others skip
+that cycle.
+
+Run it in-process with PREWARM_ENABLED=true, or on its own:
+    python prewarm.py --hub 28.6139,77.2090 --hub 19.0760,72.8777 --once
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select, text
+
+from database import AsyncSessionLocal, Destination, get_async_engine
+from itinerary import day_end_points, itinerary_cache
+from quota import background_lane
+
+logger = logging.getLogger(__name__)
+
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "false").lower() == "true"
+# Hub origins as "lat,lng;lat,lng"
+PREWARM_HUBS = os.getenv("PREWARM_HUBS", "")
+PREWARM_CONCURRENCY = int(os.getenv("PREWARM_CONCURRENCY", "2"))
+PREWARM_INTERVAL = float(os.getenv("PREWARM_INTERVAL_SECONDS", "3600"))
+PREWARM_REFRESH_BEFORE = float(os.getenv("PREWARM_REFRESH_BEFORE_SECONDS", str(24 * 3600)))
+PREWARM_MAX_DESTINATIONS = int(os.getenv("PREWARM_MAX_DESTINATIONS", "500"))
+# Spend caps per cycle: OpenAI generations and nearby searches
+PREWARM_ITINERARY_BUDGET = int(os.getenv("PREWARM_ITINERARY_BUDGET", "20"))
+PREWARM_STAYS_BUDGET = int(os.getenv("PREWARM_STAYS_BUDGET", "200"))
+# pg_try_advisory_lock key shared by every worker and the CLI
+PREWARM_LOCK_KEY = int(os.getenv("PREWARM_LOCK_KEY", "727246"))
+
+
+class Trip(NamedTuple):
+    # Field names match ItineraryRequest, so a Trip works as a cache key source
+    start_lat: float
+    start_lng: float
+    end_lat: float
+    end_lng: float
+
+
+def parse_hubs(value: str) -> List[Tuple[float, float]]:
+    hubs = []
+    for hub in filter(None, (part.strip() for part in value.split(";"))):
+        lat, lng = hub.split(",")
+        hubs.append((float(lat), float(lng)))
+    return hubs
+
+
+class Budget:
+    def __init__(self, limit: int):
+        self.remaining = limit
+
+    def take(self) -> bool:
+        if self.remaining <= 0:
+            return False
+        self.remaining -= 1
+        return True
+
+
+class Prewarmer:
+    """Keeps itineraries and stays cached for hub -> destination trips.
+
+    `generate(trip, refresh)` produces an itinerary the way the API does and
+    `prefetch_stays(lat, lng, fresh_for)` runs a stays search; both are
+    passed in so the worker shares the app's caches.
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[Trip, bool], Awaitable[Optional[str]]],
+        prefetch_stays: Callable[[float, float, float], Awaitable[object]],
+        hubs: Optional[List[Tuple[float, float]]] = None,
+        concurrency: int = PREWARM_CONCURRENCY,
+        itinerary_budget: int = PREWARM_ITINERARY_BUDGET,
+        stays_budget: int = PREWARM_STAYS_BUDGET,
+        refresh_before: float = PREWARM_REFRESH_BEFORE,
+        max_destinations: int = PREWARM_MAX_DESTINATIONS
+    ):
+        self.generate = generate
+        self.prefetch_stays = prefetch_stays
+        self.hubs = parse_hubs(PREWARM_HUBS) if hubs is None else hubs
+        self.concurrency = concurrency
+        self.itinerary_budget = itinerary_budget
+        self.stays_budget = stays_budget
+        self.refresh_before = refresh_before
+        self.max_destinations = max_destinations
+        self.last_run: dict = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def due_trips(self) -> List[Trip]:
+        """Trips whose itinerary is missing or expires within refresh_before, soonest first"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Destination.lat, Destination.long)
+                .order_by(Destination.created_at.desc(), Destination.id)
+                .limit(self.max_destinations)
+            )
+            trips = [Trip(hub_lat, hub_lng, lat, lng) for hub_lat, hub_lng in self.hubs for lat, lng in result.all()]
+            if not trips:
+                return []
+            expiries = await itinerary_cache.expiries(db, list({itinerary_cache.key_for(trip) for trip in trips}))
+
+        refresh_by = time.time() * 1000 + self.refresh_before * 1000
+        due = [(expiries.get(itinerary_cache.key_for(trip), 0), trip) for trip in trips]
+        return [trip for expires_at, trip in sorted(due) if expires_at < refresh_by]
+
+    async def run_once(self) -> dict:
+        """One pass over the due trips, unless another process is already running one"""
+        # The session-level lock lives on this connection for the pass; the
+        # pass itself uses its own short sessions. AUTOCOMMIT keeps the
+        # connection from sitting idle in a transaction, where
+        # idle_in_transaction_session_timeout would end it and drop the lock.
+        async with get_async_engine().connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            locked = await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": PREWARM_LOCK_KEY})
+            if not locked:
+                logger.info("Another process is pre-warming; skipping this pass")
+                self.last_run = {"skipped": "locked", "finished_at": int(time.time() * 1000)}
+                return self.last_run
+            try:
+                return await self._run_pass()
+            finally:
+                try:
+                    await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": PREWARM_LOCK_KEY})
+                except Exception:
+                    # Closing the connection releases the lock instead of
+                    # leaving it held by a pooled connection
+                    await conn.invalidate()
+                    raise
+
+    async def _run_pass(self) -> dict:
+        """One pass over the due trips, within this cycle's budgets"""
+        started = time.perf_counter()
+        itineraries = Budget(self.itinerary_budget)
+        stays = Budget(self.stays_budget)
+        counts = {"due": 0, "generated": 0, "stays_prefetched": 0, "failed": 0, "over_budget": 0}
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def warm(trip: Trip) -> None:
+            async with semaphore:
+                if not itineraries.take():
+                    counts["over_budget"] += 1
+                    return
+                try:
+                    itinerary_data = await self.generate(trip, True)
+                except Exception as e:
+                    counts["failed"] += 1
+                    logger.warning("Pre-warming itinerary %s failed: %r", trip, e)
+                    return
+                counts["generated"] += 1
+
+                # Fall back to the destination when the itinerary has no readable days
+                stops = day_end_points(itinerary_data) or [(trip.end_lat, trip.end_lng)]
+                stops = [stop for stop in stops if stays.take()]
+                results = await asyncio.gather(
+                    *(self.prefetch_stays(lat, lng, self.refresh_before) for lat, lng in stops),
+                    return_exceptions=True
+                )
+                for result in results:
+                    if isinstance(result, Exception):
+                        counts["failed"] += 1
+                        logger.warning("Pre-warming stays for %s failed: %r", trip, result)
+                    else:
+                        counts["stays_prefetched"] += 1
+
+        with background_lane():
+            trips = await self.due_trips()
+            counts["due"] = len(trips)
+            await asyncio.gather(*(warm(trip) for trip in trips))
+
+        self.last_run = {**counts, "finished_at": int(time.time() * 1000), "duration_s": round(time.perf_counter() - started, 1)}
+        logger.info("Pre-warm pass: %s", self.last_run)
+        return self.last_run
+
+    async def run_forever(self, interval: float = PREWARM_INTERVAL) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.warning("Pre-warm pass failed: %r", e)
+            # Wake on wall-clock multiples of the interval, so every worker
+            # contends for the lock at the same moment and one pass runs per cycle
+            await asyncio.sleep(interval - time.time() % interval)
+
+    def start(self) -> None:
+        """Run in the background of the current event loop"""
+        if self.hubs and self._task is None:
+            self._task = asyncio.ensure_future(self.run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"hubs": len(self.hubs), "running": self._task is not None, "last_run": self.last_run}
+
+
+async def _main(args) -> None:
+    # The app module wires the worker to its caches and clients
+    from clients import close_clients
+    from database import dispose_async_engine
+    from main import prewarmer
+
+    if args.hub:
+        prewarmer.hubs = parse_hubs(";".join(args.hub))
+    for name in ("concurrency", "itinerary_budget", "stays_budget", "max_destinations"):
+        if getattr(args, name) is not None:
+            setattr(prewarmer, name, getattr(args, name))
+    if not prewarmer.hubs:
+        raise SystemExit("No hub origins: pass --hub lat,lng or set PREWARM_HUBS")
+
+    try:
+        if args.once:
+            print(await prewarmer.run_once())
+        else:
+            await prewarmer.run_forever(args.interval)
+    finally:
+        await close_clients()
+        await dispose_async_engine()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate itineraries and stays for known destinations")
+    parser.add_argument("--hub", action="append", help="Hub origin as lat,lng; repeatable")
+    parser.add_argument("--once", action="store_true", help="Run a single pass and exit")
+    parser.add_argument("--interval", type=float, default=PREWARM_INTERVAL)
+    parser.add_argument("--concurrency", type=int)
+    parser.add_argument("--itinerary-budget", type=int)
+    parser.add_argument("--stays-budget", type=int)
+    parser.add_argument("--max-destinations", type=int)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
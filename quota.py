@@ -0,0 +1,180 @@
+"""Token-bucket scheduling for Google Maps calls.
+
+Every Google API gets its own bucket, refilled at that API's queries-per-
+second budget. A call that finds its bucket empty queues in its lane, and
+each token that frees up goes to the interactive lane before the background
+one, so request traffic is not stuck behind warm-up work.
+"""
+import asyncio
+import contextvars
+import os
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict
+
+from metrics import GOOGLE_QUEUE_DEPTH, GOOGLE_QUEUE_WAIT, record
+
+LANE_INTERACTIVE = "interactive"
+LANE_BACKGROUND = "background"
+LANES = (LANE_INTERACTIVE, LANE_BACKGROUND)
+
+# Queries per second per API, overridable as GOOGLE_QPS_<API>, e.g. GOOGLE_QPS_PLACE=50
+GOOGLE_DEFAULT_QPS = float(os.getenv("GOOGLE_DEFAULT_QPS", "10"))
+GOOGLE_QPS = {
+    api: float(os.getenv(f"GOOGLE_QPS_{api.upper()}", str(qps)))
+    for api, qps in {"places_nearby": 10, "place": 50, "directions": 20, "photo": 20}.items()
+}
+
+# Retries after OVER_QUERY_LIMIT, with jittered exponential backoff
+GOOGLE_QUOTA_RETRIES = int(os.getenv("GOOGLE_QUOTA_RETRIES", "3"))
+GOOGLE_QUOTA_BACKOFF = float(os.getenv("GOOGLE_QUOTA_BACKOFF_SECONDS", "0.5"))
+
+_lane: contextvars.ContextVar[str] = contextvars.ContextVar("google_lane", default=LANE_INTERACTIVE)
+
+
+class QuotaExceeded(RuntimeError):
+    """Google kept answering OVER_QUERY_LIMIT after every retry"""
+
+
+@contextmanager
+def background_lane():
+    """Queue Google calls made inside the block behind interactive ones"""
+    token = _lane.set(LANE_BACKGROUND)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+@contextmanager
+def interactive_lane():
+    """Queue Google calls made inside the block as request traffic, even within a background_lane block"""
+    token = _lane.set(LANE_INTERACTIVE)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def is_quota_error(error: BaseException) -> bool:
+    # googlemaps.exceptions.ApiError carries the API status; matching on it
+    # keeps googlemaps out of the import path
+    return getattr(error, "status", None) == "OVER_QUERY_LIMIT"
+
+
+def backoff_delay(attempt: int) -> float:
+    return GOOGLE_QUOTA_BACKOFF * 2 ** attempt * (0.5 + random.random())
+
+
+class _Bucket:
+    def __init__(self, api: str, rate: float):
+        self.api = api
+        self.rate = rate
+        self.burst = max(rate, 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.waiters = {lane: deque() for lane in LANES}
+        self.pump = None
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def take(self) -> bool:
+        self.refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def delay(self) -> float:
+        """Seconds until the next token"""
+        now = time.monotonic()
+        return max(self.updated - now, 0.0) + max(1 - self.tokens, 0.0) / self.rate
+
+    def pause(self, seconds: float) -> None:
+        """Hand out nothing for `seconds`, after Google said we are over quota"""
+        self.tokens = 0.0
+        self.updated = max(self.updated, time.monotonic() + seconds)
+
+    def next_waiter(self):
+        for lane in LANES:
+            queue = self.waiters[lane]
+            while queue:
+                waiter = queue.popleft()
+                GOOGLE_QUEUE_DEPTH.labels(self.api, lane).dec()
+                # Callers that gave up (timeouts, disconnects) leave cancelled futures behind
+                if not waiter.done():
+                    return waiter
+        return None
+
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self.waiters.values())
+
+
+class QuotaScheduler:
+    """Shared rate limiter for every Google Maps API the app calls"""
+
+    def __init__(self, budgets: Dict[str, float] = GOOGLE_QPS, default_qps: float = GOOGLE_DEFAULT_QPS):
+        self.budgets = dict(budgets)
+        self.default_qps = default_qps
+        self._buckets: Dict[str, _Bucket] = {}
+
+    def _bucket(self, api: str) -> _Bucket:
+        bucket = self._buckets.get(api)
+        if bucket is None:
+            bucket = self._buckets[api] = _Bucket(api, self.budgets.get(api, self.default_qps))
+        return bucket
+
+    async def acquire(self, api: str) -> None:
+        """Wait for a token for `api`, in the caller's lane"""
+        bucket = self._bucket(api)
+        lane = _lane.get()
+        if not bucket.queued() and bucket.take():
+            GOOGLE_QUEUE_WAIT.labels(api, lane).observe(0)
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        bucket.waiters[lane].append(waiter)
+        GOOGLE_QUEUE_DEPTH.labels(api, lane).inc()
+        if bucket.pump is None or bucket.pump.done():
+            bucket.pump = asyncio.ensure_future(self._pump(bucket))
+
+        started = time.perf_counter()
+        try:
+            await waiter
+        finally:
+            waited = time.perf_counter() - started
+            GOOGLE_QUEUE_WAIT.labels(api, lane).observe(waited)
+            record(f"gmaps.{api}.queue", waited)
+
+    async def _pump(self, bucket: _Bucket) -> None:
+        """Hand out tokens to queued calls as the bucket refills"""
+        while bucket.queued():
+            if not bucket.take():
+                await asyncio.sleep(bucket.delay())
+                continue
+            waiter = bucket.next_waiter()
+            if waiter is None:
+                bucket.tokens += 1
+                break
+            waiter.set_result(None)
+
+    def over_quota(self, api: str, attempt: int) -> float:
+        """Back the whole API off after an OVER_QUERY_LIMIT; returns the delay"""
+        delay = backoff_delay(attempt)
+        self._bucket(api).pause(delay)
+        return delay
+
+    def stats(self) -> dict:
+        return {
+            api: {"qps": bucket.rate, "tokens": round(bucket.tokens, 2), "queued": bucket.queued()}
+            for api, bucket in self._buckets.items()
+        }
+
+
+google_scheduler = QuotaScheduler()
@@ -0,0 +1,59 @@
+"""Request coalescing for identical concurrent upstream calls."""
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable
+
+from quota import interactive_lane
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers with the same key.
+
+    The first caller for a key starts the call; callers arriving while it is
+    running await the same result. The call runs as its own task, so a caller
+    that disconnects doesn't cancel it for the others. Nothing is remembered
+    once it finishes: a failure is raised to the callers that were waiting on
+    it, and the next caller starts a fresh call.
+
+    Any request may join a call, so it runs in the interactive Google lane
+    even when a background caller started it.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable], *args, **kwargs):
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run(fn, *args, **kwargs))
+            self._in_flight[key] = task
+            self.calls += 1
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    @staticmethod
+    async def _run(fn: Callable[..., Awaitable], *args, **kwargs):
+        # The task runs in a copy of the caller's context, so this doesn't
+        # change the caller's lane
+        with interactive_lane():
+            return await fn(*args, **kwargs)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Retrieve the exception so it isn't logged as unhandled when every
+        # caller has gone away
+        if not task.cancelled() and task.exception() is not None:
+            self.failures += 1
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "in_flight": len(self._in_flight)
+        }
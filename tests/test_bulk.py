@@ -0,0 +1,48 @@
+"""Streaming NDJSON/CSV parsing for POST /destinations/bulk."""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bulk import iter_records
+
+
+def parse(body: bytes, content_type: str, chunk_size: int = 3) -> list:
+    async def chunks():
+        for start in range(0, len(body), chunk_size):
+            yield body[start:start + chunk_size]
+
+    async def collect():
+        return [(line, str(record) if isinstance(record, ValueError) else record)
+                async for line, record in iter_records(chunks(), content_type)]
+
+    return asyncio.run(collect())
+
+
+def test_csv_quoted_newlines_bom_and_line_numbers():
+    body = '﻿name,lat,long,image_urls\r\n"Hotel\r\nwith ""view""",1,2,a|b\r\n\r\nPlain,3,4,\r\n'.encode()
+    assert parse(body, "text/csv") == [
+        (2, {"name": 'Hotel\nwith "view"', "lat": "1", "long": "2", "image_urls": ["a", "b"]}),
+        (5, {"name": "Plain", "lat": "3", "long": "4", "image_urls": []})
+    ]
+
+
+def test_csv_errors_are_reported_per_record():
+    body = b'name,lat,long\n\xff\xfe,1,2\n"a"b,1,2\nOk,1,2\nLast,5,"open\n'
+    assert parse(body, "text/csv") == [
+        (2, "Line is not valid UTF-8 (byte 0)"),
+        (3, "Malformed CSV: ',' expected after '\"'"),
+        (4, {"name": "Ok", "lat": "1", "long": "2", "image_urls": []}),
+        (5, "Malformed CSV: unexpected end of data")
+    ]
+
+
+def test_ndjson_errors_are_reported_per_line():
+    body = b'\xef\xbb\xbf{"name": "a"}\n\n\xff\n[1]\n{"name": "b"}'
+    assert parse(body, "application/x-ndjson", chunk_size=2) == [
+        (1, {"name": "a"}),
+        (3, "Line is not valid UTF-8 (byte 0)"),
+        (4, "Expected a JSON object"),
+        (5, {"name": "b"})
+    ]
@@ -0,0 +1,157 @@
+"""Shared cache backends, against benchmarks/fake_redis.py and a temporary SQLite file."""
+import asyncio
+import marshal
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+# Appended, so benchmarks/cache_backends.py doesn't shadow the module under test
+sys.path.append(os.path.join(REPO_ROOT, "benchmarks"))
+
+import cache_backends
+from cache_backends import Cache, RedisBackend, RedisError, SQLiteBackend, decode_value, encode_value, read_reply
+import fake_redis
+
+
+async def parse(data: bytes):
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return await read_reply(reader)
+
+
+async def with_redis(test):
+    """Run `test(url)` against a fresh in-process stand-in server"""
+    server = await fake_redis.serve("127.0.0.1", 0)
+    try:
+        return await test(f"redis://127.0.0.1:{server.sockets[0].getsockname()[1]}/0")
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+def test_read_reply_types():
+    assert asyncio.run(parse(b"+OK\r\n")) == "OK"
+    assert asyncio.run(parse(b":42\r\n")) == 42
+    assert asyncio.run(parse(b"$5\r\nhe\r\no\r\n")) == b"he\r\no"
+    assert asyncio.run(parse(b"$-1\r\n")) is None
+    assert asyncio.run(parse(b"*-1\r\n")) is None
+    assert asyncio.run(parse(b"*3\r\n$1\r\na\r\n$-1\r\n*1\r\n:1\r\n")) == [b"a", None, [1]]
+
+
+def test_read_reply_error():
+    with pytest.raises(RedisError, match="WRONGTYPE"):
+        asyncio.run(parse(b"-WRONGTYPE Operation against a key\r\n"))
+
+
+def test_pipeline_returns_errors_in_place():
+    async def test(url):
+        backend = RedisBackend(url)
+        try:
+            replies = await backend.pipeline([("SET", "a", b"1"), ("NOSUCH",), ("GET", "a"), ("GET", "missing")])
+        finally:
+            await backend.close()
+        assert replies[0] == "OK"
+        assert isinstance(replies[1], RedisError)
+        assert replies[2:] == [b"1", None]
+
+    asyncio.run(with_redis(test))
+
+
+def test_redis_round_trip_and_px_expiry():
+    async def test(url):
+        cache = Cache("test", RedisBackend(url), ttl=60)
+        try:
+            await cache.set_many({"kept": {"name": "Stay", "lat": 32.2}, "brief": "x"})
+            await cache.set("brief", "x", ttl=0.05)
+            assert await cache.get_many(["kept", "brief", "missing"]) == {"kept": {"name": "Stay", "lat": 32.2}, "brief": "x"}
+            await asyncio.sleep(0.1)
+            assert await cache.get("brief") is None
+            assert await cache.get("kept") == {"name": "Stay", "lat": 32.2}
+        finally:
+            await cache.backend.close()
+        assert cache.errors == 0
+
+    asyncio.run(with_redis(test))
+
+
+def test_timeout_drops_connection(monkeypatch):
+    monkeypatch.setattr(cache_backends, "CACHE_TIMEOUT", 0.05)
+
+    async def stall(reader, writer):
+        # Read commands and never answer
+        while await reader.read(1024):
+            pass
+        writer.close()
+
+    async def test():
+        server = await asyncio.start_server(stall, "127.0.0.1", 0)
+        backend = RedisBackend(f"redis://127.0.0.1:{server.sockets[0].getsockname()[1]}/0", pool_size=1)
+        cache = Cache("test", backend, ttl=60)
+        try:
+            assert await cache.get("key") is None
+            assert await cache.get("key") is None
+        finally:
+            server.close()
+            await server.wait_closed()
+        # Timed-out connections are closed, not returned to the pool, and
+        # their pool slot is released
+        assert cache.errors == 2
+        assert backend._idle == []
+        assert not backend._slots.locked()
+
+    asyncio.run(test())
+
+
+@pytest.mark.parametrize("raw", [
+    bytes((marshal.version << 1,)) + marshal.dumps({"name": "old"}),
+    bytes((0x10,)) + b"{not json",
+    bytes((0x11,)) + b"not zlib",
+    b""
+])
+def test_unreadable_entries_are_misses(raw):
+    async def test(url):
+        cache = Cache("test", RedisBackend(url), ttl=60)
+        try:
+            await cache.backend.set_many({"test:key": raw}, ttl=60)
+            assert await cache.get("key") is None
+        finally:
+            await cache.backend.close()
+        assert cache.misses == 1
+
+    asyncio.run(with_redis(test))
+
+
+def test_codec_round_trip():
+    small = {"name": "Hotel", "phone": None, "lat": 32.25, "tags": ["a", "b"]}
+    large = {"photo_reference": "x" * 4000}
+    assert decode_value(encode_value(small)) == small
+    assert decode_value(encode_value(large)) == large
+    assert decode_value(encode_value("itinerary")) == "itinerary"
+    # Large repetitive values are stored compressed
+    assert encode_value(large)[0] & 0x01
+    assert len(encode_value(large)) < 4000
+
+
+def test_sqlite_entries_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+
+    async def test():
+        writer = Cache("test", SQLiteBackend(path), ttl=60)
+        reader = Cache("test", SQLiteBackend(path), ttl=60)
+        try:
+            await writer.set_many({("a", 1): [1, 2], "b": "two"})
+            await writer.set("brief", 1, ttl=0.05)
+            assert await reader.get_many([("a", 1), "b", "missing"]) == {("a", 1): [1, 2], "b": "two"}
+            await reader.delete("b")
+            assert await writer.get("b") is None
+            await asyncio.sleep(0.1)
+            assert await reader.get("brief") is None
+        finally:
+            await writer.backend.close()
+            await reader.backend.close()
+
+    asyncio.run(test())
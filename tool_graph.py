@@ -0,0 +1,134 @@
+"""Load and run the tool graph described in mcp_graph.json.
+
+An edge makes its source wait for its target: "uses", "references" and
+"depends_on" all mean the source needs the target's output. Each node starts
+as soon as its dependencies finish, so independent branches run concurrently
+and a run takes about as long as the graph's critical path.
+"""
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List
+
+from metrics import record
+
+MCP_GRAPH_PATH = os.getenv("MCP_GRAPH_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "mcp_graph.json"))
+
+# handler(node, inputs by dependency name, run context) -> node output
+NodeHandler = Callable[[dict, Dict[str, Any], dict], Awaitable[Any]]
+
+
+class ToolGraph:
+    """Nodes, their dependencies and a topological order"""
+
+    def __init__(self, nodes: List[dict], edges: List[dict]):
+        self.nodes = {node["id"]: node for node in nodes}
+        self.dependencies: Dict[str, List[str]] = {node_id: [] for node_id in self.nodes}
+        for edge in edges:
+            if edge["source"] not in self.nodes or edge["target"] not in self.nodes:
+                raise ValueError(f"Edge {edge['source']} -> {edge['target']} names an unknown node")
+            self.dependencies[edge["source"]].append(edge["target"])
+        self.order = self._topological_order()
+
+    @classmethod
+    def load(cls, path: str = MCP_GRAPH_PATH) -> "ToolGraph":
+        with open(path) as f:
+            graph = json.load(f)["graph"]
+        return cls(graph["nodes"], graph["edges"])
+
+    def _topological_order(self) -> List[str]:
+        # Kahn's algorithm; dependencies come before the nodes that need them
+        dependents: Dict[str, List[str]] = {node_id: [] for node_id in self.nodes}
+        remaining = {}
+        for node_id, dependencies in self.dependencies.items():
+            remaining[node_id] = len(dependencies)
+            for dependency in dependencies:
+                dependents[dependency].append(node_id)
+
+        ready = deque(node_id for node_id, count in remaining.items() if count == 0)
+        order = []
+        while ready:
+            node_id = ready.popleft()
+            order.append(node_id)
+            for dependent in dependents[node_id]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+        if len(order) != len(self.nodes):
+            cyclic = sorted(node_id for node_id, count in remaining.items() if count)
+            raise ValueError(f"Tool graph has a cycle through {', '.join(cyclic)}")
+        return order
+
+
+class GraphRun:
+    """One execution of a ToolGraph.
+
+    Handlers are looked up by node name, then by node type. Each node runs
+    at most once per run and every dependent shares its result.
+    """
+
+    def __init__(self, graph: ToolGraph, handlers: Dict[str, NodeHandler], context: dict):
+        self.graph = graph
+        self.handlers = handlers
+        self.context = context
+        self.timings: Dict[str, dict] = {}
+        self._tasks: Dict[str, asyncio.Future] = {}
+        self._started = 0.0
+
+    async def run(self) -> Dict[str, Any]:
+        """Run every node; returns outputs by node id"""
+        self._started = time.perf_counter()
+        try:
+            outputs = await asyncio.gather(*(self.result(node_id) for node_id in self.graph.order))
+        except BaseException:
+            for task in self._tasks.values():
+                task.cancel()
+            raise
+        return dict(zip(self.graph.order, outputs))
+
+    def result(self, node_id: str) -> asyncio.Future:
+        task = self._tasks.get(node_id)
+        if task is None:
+            task = self._tasks[node_id] = asyncio.ensure_future(self._run_node(node_id))
+        return task
+
+    async def _run_node(self, node_id: str) -> Any:
+        node = self.graph.nodes[node_id]
+        dependencies = self.graph.dependencies[node_id]
+        outputs = await asyncio.gather(*(self.result(dependency) for dependency in dependencies))
+        inputs = {self.graph.nodes[dependency]["name"]: output for dependency, output in zip(dependencies, outputs)}
+
+        handler = self.handlers.get(node["name"]) or self.handlers.get(node["type"])
+        if handler is None:
+            raise LookupError(f"No handler for graph node {node['name']!r}")
+
+        started = time.perf_counter()
+        try:
+            return await handler(node, inputs, self.context)
+        finally:
+            finished = time.perf_counter()
+            self.timings[node_id] = {
+                "name": node["name"],
+                "start_ms": round((started - self._started) * 1000, 1),
+                "duration_ms": round((finished - started) * 1000, 1)
+            }
+            record(f"plan.{node['name']}", finished - started)
+
+    def report(self) -> dict:
+        """Per-node timings, the critical path and how it compares to running nodes one by one"""
+        # Longest chain of node durations, walking dependencies in topological order
+        longest: Dict[str, tuple] = {}
+        for node_id in self.graph.order:
+            duration = self.timings.get(node_id, {}).get("duration_ms", 0.0)
+            before = max((longest[dependency] for dependency in self.graph.dependencies[node_id]), default=(0.0, []))
+            longest[node_id] = (before[0] + duration, before[1] + [node_id])
+        critical_ms, critical_path = max(longest.values(), default=(0.0, []))
+        return {
+            "nodes": self.timings,
+            "critical_path": [self.graph.nodes[node_id]["name"] for node_id in critical_path],
+            "critical_path_ms": round(critical_ms, 1),
+            "sum_ms": round(sum(timing["duration_ms"] for timing in self.timings.values()), 1),
+            "total_ms": round((time.perf_counter() - self._started) * 1000, 1)
+        }